@@ -1,21 +1,164 @@
-from firebase_admin import auth
 from fastapi import HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from models import User
 from sqlmodel import Session, select
+from cachetools import TLRUCache, TTLCache
+from sqlalchemy.orm import make_transient_to_detached
+from cache import StatsCache
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
 security = HTTPBearer()
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Upper bound on how long a verified token is trusted, on top of its own exp claim
+TOKEN_CACHE_MAX_TTL = int(os.getenv("TOKEN_CACHE_MAX_TTL", "600"))
+# Signing certificates are refetched this long before their max-age runs out
+CERT_REFRESH_MARGIN = int(os.getenv("CERT_REFRESH_MARGIN", "300"))
+# Refresh period when the certificates come without a max-age, and the retry delay after a failed refresh
+CERT_REFRESH_INTERVAL = int(os.getenv("CERT_REFRESH_INTERVAL", "1800"))
+CERT_REFRESH_RETRY = int(os.getenv("CERT_REFRESH_RETRY", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", "houseparty-26abf-firebase-adminsdk-fbsvc-529fbe0b54.json")
+
+_firebase_lock = threading.Lock()
+_firebase_ready = False
+
+def firebase_auth():
+    """firebase_admin.auth, imported and initialized on first use instead of at import time"""
+    global _firebase_ready
+    if not _firebase_ready:
+        with _firebase_lock:
+            if not _firebase_ready:
+                import firebase_admin
+                from firebase_admin import credentials
+                firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS))
+                _firebase_ready = True
+    from firebase_admin import auth
+    return auth
+
+def _token_expiry(key, decoded_token, now):
+    return min(decoded_token.get("exp", now), now + TOKEN_CACHE_MAX_TTL)
+
+# sha256(token) -> decoded claims, evicted LRU or once the token expires
+token_cache = StatsCache(TLRUCache(maxsize=TOKEN_CACHE_SIZE, ttu=_token_expiry, timer=time.time))
+# firebase uid -> detached User snapshot, never handed out directly (see get_user_by_firebase_uid)
+user_cache = StatsCache(TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, timer=time.time))
+# firebase uid -> lease of the read that may fill its cache entry, invalidate_user revokes it
+_user_leases = {}
+_user_leases_lock = threading.Lock()
 
 async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        # Verify the ID token
-        decoded_token = auth.verify_id_token(credentials.credentials)
+    return await verify_token(credentials.credentials)
+
+async def verify_token(token: str) -> dict:
+    """Verify a Firebase ID token through the token cache, raises a 401 HTTPException"""
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    decoded_token = token_cache.get(token_key)
+    if decoded_token is not None:
         return decoded_token
+    try:
+        # Verify the ID token, off the event loop since it does RSA work and may fetch certs
+        decoded_token = await run_in_threadpool(_verify_id_token, token)
     except Exception as e:
         raise HTTPException(
-            status_code=401, 
+            status_code=401,
             detail=f"Invalid authentication token: {str(e)}"
         )
+    token_cache.set(token_key, decoded_token)
+    return decoded_token
+
+def _verify_id_token(token: str) -> dict:
+    return firebase_auth().verify_id_token(token)
+
+def _certificate_request():
+    """The verifier's HTTP transport, whose cachecontrol cache verify_id_token reads the certificates from.
+
+    That is firebase_admin internals, requirements.txt pins the version it was written against.
+    """
+    try:
+        return firebase_auth()._get_client(None)._token_verifier.request
+    except AttributeError as e:
+        raise RuntimeError(
+            "firebase_admin no longer exposes its token verifier's transport, "
+            "check refresh_public_keys against the installed firebase-admin"
+        ) from e
+
+def refresh_public_keys() -> int | None:
+    """Download Google's ID token signing certificates into the verifier's HTTP cache,
+    returns their max-age in seconds (None without one).
+
+    no-cache makes cachecontrol go to the network even while its copy is still
+    fresh, so the cache is replaced before it expires and request-time
+    verification never waits on the download.
+    """
+    from firebase_admin import _token_gen
+    response = _certificate_request()(_token_gen.ID_TOKEN_CERT_URI, headers={"Cache-Control": "no-cache"})
+    if response.status != 200:
+        raise RuntimeError(f"Fetching signing certificates failed with HTTP {response.status}")
+    max_age = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    return int(max_age.group(1)) if max_age else None
+
+def refresh_delay(max_age: int | None) -> float:
+    """Seconds until the next refresh, shortly before certificates with this max-age go stale"""
+    if max_age is None:
+        return CERT_REFRESH_INTERVAL
+    return max(max_age - CERT_REFRESH_MARGIN, CERT_REFRESH_RETRY)
+
+async def refresh_public_keys_forever(delay: float = 0) -> None:
+    await asyncio.sleep(delay)
+    while True:
+        try:
+            delay = refresh_delay(await run_in_threadpool(refresh_public_keys))
+        except Exception:
+            logger.warning("Refreshing Firebase public keys failed", exc_info=True)
+            delay = CERT_REFRESH_RETRY
+        await asyncio.sleep(delay)
+
+def get_user_by_firebase_uid(db: Session, uid : str):
+    cached = user_cache.get(uid)
+    if cached is not None:
+        # merge(load=False) attaches a copy of the snapshot to this session without a SELECT
+        return db.merge(cached, load=False)
+    # A write committed while the SELECT runs revokes the lease, the row read may
+    # predate it and must not be cached for USER_CACHE_TTL
+    lease = object()
+    with _user_leases_lock:
+        _user_leases[uid] = lease
+    try:
+        statement = select(User).where(User.firebase_uid == uid)
+        user = db.exec(statement).first()
+    except BaseException:
+        _release_lease(uid, lease)
+        raise
+    snapshot = None
+    if user is not None:
+        snapshot = User(**user.model_dump())
+        make_transient_to_detached(snapshot)
+    _release_lease(uid, lease, snapshot)
+    return user
+
+def _release_lease(uid: str, lease: object, snapshot: User | None = None) -> None:
+    """Cache the snapshot if the lease was not revoked in the meantime"""
+    with _user_leases_lock:
+        if _user_leases.get(uid) is not lease:
+            return
+        del _user_leases[uid]
+        if snapshot is not None:
+            user_cache.set(uid, snapshot)
+
+def invalidate_user(uid: str) -> None:
+    """Drop a cached user, call after committing any change to the user row"""
+    with _user_leases_lock:
+        _user_leases.pop(uid, None)
+        user_cache.pop(uid)
 
-async def get_user_by_firebase_uid(db: Session, uid : str):
-    statement = select(User).where(User.firebase_uid == uid)
-    return db.exec(statement).first()
\ No newline at end of file
+def cache_stats() -> dict:
+    return {"token_cache": token_cache.stats(), "user_cache": user_cache.stats()}
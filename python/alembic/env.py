@@ -23,6 +23,15 @@ if config.config_file_name is not None:
 from models import SQLModel
 target_metadata = SQLModel.metadata
 
+# Virtual tables (and their shadow tables) created by raw DDL, not in the metadata
+UNMANAGED_TABLE_PREFIXES = ("party_rtree", "party_fts")
+
+def include_name(name, type_, parent_names):
+    """Keep autogenerate from emitting drops for the unmanaged tables"""
+    if type_ == "table":
+        return not name.startswith(UNMANAGED_TABLE_PREFIXES)
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -45,6 +54,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -68,7 +78,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
@@ -0,0 +1,34 @@
+"""add_party_is_active
+
+Revision ID: 0c9e4a7b2d15
+Revises: 6f1c2b8d4e97
+Create Date: 2026-10-18 21:08:44.712903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c9e4a7b2d15'
+down_revision: Union[str, Sequence[str], None] = '6f1c2b8d4e97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Parties that have already ended start out active, the first lifecycle
+    # sweep ends them and counts them into parties_thrown
+    op.add_column('party', sa.Column('is_active', sa.Boolean(), nullable=False, server_default='1'))
+    op.create_index('ix_party_is_active_end_time', 'party', ['is_active', 'end_time'], unique=False)
+    op.create_index(op.f('ix_user_current_party_id'), 'user', ['current_party_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_current_party_id'), table_name='user')
+    op.drop_index('ix_party_is_active_end_time', table_name='party')
+    op.drop_column('party', 'is_active')
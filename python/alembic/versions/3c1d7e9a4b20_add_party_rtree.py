@@ -0,0 +1,51 @@
+"""add_party_rtree
+
+Revision ID: 3c1d7e9a4b20
+Revises: 95fc857c3898
+Create Date: 2026-10-18 11:20:47.903215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1d7e9a4b20'
+down_revision: Union[str, Sequence[str], None] = '95fc857c3898'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS party_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)")
+    op.execute(
+        "INSERT OR REPLACE INTO party_rtree "
+        "SELECT id, latitude, latitude, longitude, longitude FROM party "
+        "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )
+    op.execute("""CREATE TRIGGER IF NOT EXISTS party_rtree_ai AFTER INSERT ON party
+    WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+    BEGIN
+        INSERT INTO party_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS party_rtree_au AFTER UPDATE OF latitude, longitude ON party
+    BEGIN
+        DELETE FROM party_rtree WHERE id = old.id;
+        INSERT INTO party_rtree SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS party_rtree_ad AFTER DELETE ON party
+    BEGIN
+        DELETE FROM party_rtree WHERE id = old.id;
+    END""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS party_rtree_ad")
+    op.execute("DROP TRIGGER IF EXISTS party_rtree_au")
+    op.execute("DROP TRIGGER IF EXISTS party_rtree_ai")
+    op.execute("DROP TABLE IF EXISTS party_rtree")
@@ -0,0 +1,30 @@
+"""add_row_versions
+
+Revision ID: 6f1c2b8d4e97
+Revises: d5a8e3c71f42
+Create Date: 2026-10-18 19:21:05.340118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f1c2b8d4e97'
+down_revision: Union[str, Sequence[str], None] = 'd5a8e3c71f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('party', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('user', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'version')
+    op.drop_column('party', 'version')
@@ -0,0 +1,52 @@
+"""add_party_fts
+
+Revision ID: 8e5a0c2f6d13
+Revises: 3c1d7e9a4b20
+Create Date: 2026-10-18 12:02:19.117640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e5a0c2f6d13'
+down_revision: Union[str, Sequence[str], None] = '3c1d7e9a4b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS party_fts USING fts5("
+        "name, description, hashtags, content='party', content_rowid='id', prefix='2 3')"
+    )
+    op.execute("INSERT INTO party_fts(party_fts) VALUES ('rebuild')")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS party_fts_ai AFTER INSERT ON party
+    BEGIN
+        INSERT INTO party_fts(rowid, name, description, hashtags)
+        VALUES (new.id, new.name, new.description, new.hashtags);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS party_fts_au AFTER UPDATE OF name, description, hashtags ON party
+    BEGIN
+        INSERT INTO party_fts(party_fts, rowid, name, description, hashtags)
+        VALUES ('delete', old.id, old.name, old.description, old.hashtags);
+        INSERT INTO party_fts(rowid, name, description, hashtags)
+        VALUES (new.id, new.name, new.description, new.hashtags);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS party_fts_ad AFTER DELETE ON party
+    BEGIN
+        INSERT INTO party_fts(party_fts, rowid, name, description, hashtags)
+        VALUES ('delete', old.id, old.name, old.description, old.hashtags);
+    END""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS party_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS party_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS party_fts_ai")
+    op.execute("DROP TABLE IF EXISTS party_fts")
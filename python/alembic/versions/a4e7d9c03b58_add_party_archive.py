@@ -0,0 +1,61 @@
+"""add_party_archive
+
+Revision ID: a4e7d9c03b58
+Revises: 0c9e4a7b2d15
+Create Date: 2026-10-18 23:36:19.508227
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e7d9c03b58'
+down_revision: Union[str, Sequence[str], None] = '0c9e4a7b2d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'party_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('host_id', sa.Integer(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('address', sa.String(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=True),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('max_attendees', sa.Integer(), nullable=True),
+        sa.Column('attendee_count', sa.Integer(), nullable=False),
+        sa.Column('hashtags', sa.String(), nullable=True),
+        sa.Column('media_url', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_party_archive_end_time', 'party_archive', ['end_time'], unique=False)
+    op.create_index('ix_party_archive_host_id_end_time', 'party_archive', ['host_id', 'end_time'], unique=False)
+    op.create_table(
+        'attendance_archive',
+        sa.Column('party_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('joined_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('party_id', 'user_id'),
+    )
+    op.create_index(op.f('ix_attendance_archive_user_id'), 'attendance_archive', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_attendance_archive_user_id'), table_name='attendance_archive')
+    op.drop_table('attendance_archive')
+    op.drop_index('ix_party_archive_host_id_end_time', table_name='party_archive')
+    op.drop_index('ix_party_archive_end_time', table_name='party_archive')
+    op.drop_table('party_archive')
@@ -0,0 +1,35 @@
+"""add_party_attendee_count
+
+Revision ID: b7d41f2e9a60
+Revises: 8e5a0c2f6d13
+Create Date: 2026-10-18 14:02:37.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41f2e9a60'
+down_revision: Union[str, Sequence[str], None] = '8e5a0c2f6d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('party', sa.Column('attendee_count', sa.Integer(), nullable=False, server_default='0'))
+    # Backfill the counts from the attendance table
+    op.execute(
+        "UPDATE party SET attendee_count = "
+        "(SELECT COUNT(*) FROM attendance WHERE attendance.party_id = party.id)"
+    )
+    op.create_index(op.f('ix_party_attendee_count'), 'party', ['attendee_count'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_party_attendee_count'), table_name='party')
+    op.drop_column('party', 'attendee_count')
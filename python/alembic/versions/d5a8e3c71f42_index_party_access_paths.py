@@ -0,0 +1,31 @@
+"""index_party_access_paths
+
+Revision ID: d5a8e3c71f42
+Revises: b7d41f2e9a60
+Create Date: 2026-10-18 16:47:12.904155
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8e3c71f42'
+down_revision: Union[str, Sequence[str], None] = 'b7d41f2e9a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Host.user_id lookups already use the UNIQUE constraint's sqlite_autoindex_host_1
+    op.create_index('ix_party_host_id_created_at', 'party', ['host_id', 'created_at'], unique=False)
+    op.create_index('ix_party_end_time_start_time', 'party', ['end_time', 'start_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_party_end_time_start_time', table_name='party')
+    op.drop_index('ix_party_host_id_created_at', table_name='party')
@@ -0,0 +1,65 @@
+"""add_attendance_table
+
+Revision ID: f2240e217797
+Revises: e3b646493c91
+Create Date: 2026-10-18 09:12:31.482113
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2240e217797'
+down_revision: Union[str, Sequence[str], None] = 'e3b646493c91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'attendance',
+        sa.Column('party_id', sa.Integer(), sa.ForeignKey('party.id'), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('joined_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('party_id', 'user_id'),
+    )
+    op.create_index(op.f('ix_attendance_user_id'), 'attendance', ['user_id'], unique=False)
+
+    # Backfill attendance rows from the old JSON attendee_ids column
+    conn = op.get_bind()
+    attendance = sa.table(
+        'attendance',
+        sa.column('party_id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+    )
+    rows = []
+    for party_id, attendee_ids in conn.execute(sa.text("SELECT id, attendee_ids FROM party")):
+        try:
+            user_ids = json.loads(attendee_ids or "[]")
+        except (json.JSONDecodeError, TypeError):
+            user_ids = []
+        rows.extend({"party_id": party_id, "user_id": user_id} for user_id in set(user_ids))
+    if rows:
+        op.bulk_insert(attendance, rows)
+
+    with op.batch_alter_table('party') as batch_op:
+        batch_op.drop_column('attendee_ids')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('party') as batch_op:
+        batch_op.add_column(sa.Column('attendee_ids', sa.String(), nullable=False, server_default="[]"))
+
+    op.execute(
+        "UPDATE party SET attendee_ids = '[' || COALESCE("
+        "(SELECT group_concat(user_id, ',') FROM attendance WHERE attendance.party_id = party.id), '') || ']'"
+    )
+
+    op.drop_index(op.f('ix_attendance_user_id'), table_name='attendance')
+    op.drop_table('attendance')
@@ -0,0 +1,116 @@
+"""Hot/cold split: move ended parties out of the live tables.
+
+Parties the lifecycle sweep has ended (is_active = 0) are copied with their
+attendance into party_archive / attendance_archive and deleted from party /
+attendance once they have been over for PARTY_ARCHIVE_AFTER_HOURS. The
+delete also drops them from party_rtree and party_fts through the existing
+triggers, so every live query, index and virtual table only grows with the
+number of current parties, not with history. GET /parties/history reads the
+archive.
+
+Each batch of PARTY_ARCHIVE_BATCH_SIZE parties is its own transaction of four
+set-based statements. A party that another process archived first is simply
+not found by the INSERT ... SELECT, so concurrent archivers are harmless.
+It runs from the lifecycle loop right after each sweep.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import datetime as dt
+from typing import List
+
+from sqlalchemy import insert, literal
+from sqlmodel import Session, delete, select
+
+import filter_cache
+import models
+from database import engine
+
+PARTY_ARCHIVE = os.getenv("PARTY_ARCHIVE", "1").lower() in ("1", "true", "yes")
+# Ended parties stay live (detail pages, saved lists) this long before moving
+PARTY_ARCHIVE_AFTER_HOURS = float(os.getenv("PARTY_ARCHIVE_AFTER_HOURS", "24"))
+PARTY_ARCHIVE_BATCH_SIZE = int(os.getenv("PARTY_ARCHIVE_BATCH_SIZE", "500"))
+
+# Columns copied from party, every archive column except archived_at
+_PARTY_COLUMNS = [column.name for column in models.ArchivedParty.__table__.columns if column.name != "archived_at"]
+_ATTENDANCE_COLUMNS = [column.name for column in models.ArchivedAttendance.__table__.columns]
+
+class ArchiveStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.parties = 0
+        self.attendance = 0
+        self.last_seconds = 0.0
+
+    def record(self, parties: int, attendance: int, seconds: float) -> None:
+        with self._lock:
+            self.runs += 1
+            self.parties += parties
+            self.attendance += attendance
+            self.last_seconds = seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "parties": self.parties,
+                "attendance": self.attendance,
+                "last_seconds": self.last_seconds,
+            }
+
+stats = ArchiveStats()
+
+def archive_batch(db: Session, cutoff: datetime, now: datetime, limit: int) -> tuple[List[int], int]:
+    """Move one batch of parties inactive since before cutoff, returns their ids and the attendance rows moved.
+
+    Does not commit.
+    """
+    Party, Attendance = models.Party, models.Attendance
+    party_ids = db.exec(
+        select(Party.id).where(~Party.is_active, Party.end_time < cutoff).order_by(Party.end_time).limit(limit)
+    ).all()
+    if not party_ids:
+        return [], 0
+    party = Party.__table__
+    attendance = Attendance.__table__
+    moved = db.exec(
+        insert(models.ArchivedParty).from_select(
+            [*_PARTY_COLUMNS, "archived_at"],
+            select(
+                *[party.c[name] for name in _PARTY_COLUMNS], literal(now, models.ArchivedParty.__table__.c.archived_at.type)
+            ).where(party.c.id.in_(party_ids)),
+        )
+    ).rowcount
+    if not moved:
+        return [], 0
+    attendees = db.exec(
+        insert(models.ArchivedAttendance).from_select(
+            _ATTENDANCE_COLUMNS,
+            select(*[attendance.c[name] for name in _ATTENDANCE_COLUMNS]).where(attendance.c.party_id.in_(party_ids)),
+        )
+    ).rowcount
+    db.exec(delete(Attendance).where(Attendance.party_id.in_(party_ids)))
+    db.exec(delete(Party).where(Party.id.in_(party_ids)))
+    return list(party_ids), attendees
+
+def archive(after_hours: float = PARTY_ARCHIVE_AFTER_HOURS, batch_size: int = PARTY_ARCHIVE_BATCH_SIZE) -> int:
+    """Archive every party ended more than after_hours ago, one transaction per batch, returns the count"""
+    started = time.perf_counter()
+    # Timestamps are stored as naive UTC
+    now = datetime.now(dt.UTC).replace(tzinfo=None)
+    cutoff = now - timedelta(hours=after_hours)
+    parties = attendees = 0
+    while True:
+        with Session(engine) as db:
+            party_ids, moved = archive_batch(db, cutoff, now, batch_size)
+            db.commit()
+        if party_ids:
+            filter_cache.invalidate_parties(party_ids)
+        parties += len(party_ids)
+        attendees += moved
+        if len(party_ids) < batch_size:
+            break
+    stats.record(parties, attendees, time.perf_counter() - started)
+    return parties
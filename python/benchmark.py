@@ -0,0 +1,336 @@
+"""Load benchmark for the party API.
+
+Generates a synthetic dataset (parties, users, hosts, attendance and saved
+lists) straight into a scratch SQLite file, runs the app under uvicorn in a
+child process with Firebase token verification replaced by a local stub, and
+drives the main endpoints with concurrent clients:
+
+    python benchmark.py --dataset 10k --concurrency 1 8 32 --duration 10
+    python benchmark.py --dataset 100k --db /tmp/bench-100k.db   # reuse a generated file
+    python benchmark.py --dataset 10k --json results.json        # keep numbers for comparison
+
+For every concurrency level it reports per-endpoint p50/p95/p99 latency,
+throughput and the average number of SQL statements per request. "loop p95"
+is the latency of the database-free /cache-stats route measured alongside
+the load, which shows how long the event loop is blocked.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DATASETS = {
+    "10k": {"parties": 10_000, "users": 10_000},
+    "100k": {"parties": 100_000, "users": 100_000},
+    "1m": {"parties": 1_000_000, "users": 1_000_000},
+}
+HOST_FRACTION = 0.05
+CITIES = [
+    (40.7128, -74.0060), (34.0522, -118.2437), (41.8781, -87.6298), (29.7604, -95.3698),
+    (25.7617, -80.1918), (52.5200, 13.4050), (51.5074, -0.1278), (37.7749, -122.4194),
+]
+HASHTAGS = ["#techno", "#house", "#jazz", "#rooftop", "#brunch", "#afterhours", "#karaoke", "#silentdisco"]
+WORDS = ["neon", "sunset", "groove", "warehouse", "garden", "underground", "retro", "late", "night", "beats"]
+BATCH_SIZE = 10_000
+
+# Dataset generation
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def generate_dataset(db_path: str, parties: int, users: int, seed: int = 42) -> None:
+    """Write a synthetic dataset with raw executemany batches, one transaction per batch"""
+    from sqlmodel import SQLModel, create_engine
+    import models  # noqa: F401 - registers the tables
+    import spatial  # noqa: F401 - registers the R*Tree DDL
+    import search  # noqa: F401 - registers the FTS5 DDL
+
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{db_path}")
+    SQLModel.metadata.create_all(engine)
+    now = datetime.utcnow()
+    hosts = max(1, int(users * HOST_FRACTION))
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+        def user_rows():
+            for user_id in range(1, users + 1):
+                saved = rng.sample(range(1, parties + 1), k=min(parties, rng.randint(0, 8)))
+                yield (user_id, f"user{user_id}", f"user{user_id}@example.com", f"user{user_id}",
+                       user_id <= hosts, json.dumps(saved), now, now)
+        for batch in _batches(user_rows()):
+            conn.exec_driver_sql(
+                "INSERT INTO user (id, username, email, firebase_uid, isHost, saved_party_ids, created_at, updated_at, email_verified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)", batch)
+            conn.commit()
+
+        # Host.id == User.id so party.host_id is valid under either reading
+        for batch in _batches((user_id, user_id, 0, now) for user_id in range(1, hosts + 1)):
+            conn.exec_driver_sql("INSERT INTO host (id, user_id, parties_thrown, created_at) VALUES (?, ?, ?, ?)", batch)
+            conn.commit()
+
+        def party_rows():
+            for party_id in range(1, parties + 1):
+                lat, lng = rng.choice(CITIES)
+                start = now + timedelta(hours=rng.uniform(-72, 24 * 14))
+                name = " ".join(rng.sample(WORDS, 2)) + " party"
+                tags = " ".join(rng.sample(HASHTAGS, 2))
+                yield (party_id, name, f"{name} with {tags}", rng.randint(1, hosts),
+                       lat + rng.gauss(0, 0.15), lng + rng.gauss(0, 0.15), f"{party_id} Main St",
+                       start, start + timedelta(hours=rng.uniform(2, 12)), rng.choice([None, 50, 100, 300]),
+                       tags, now - timedelta(seconds=parties - party_id), now)
+        for batch in _batches(party_rows()):
+            conn.exec_driver_sql(
+                "INSERT INTO party (id, name, description, host_id, latitude, longitude, address, start_time, end_time, "
+                "max_attendees, hashtags, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            conn.commit()
+
+        # Every third user is at a party right now
+        def attendance_rows():
+            for user_id in range(1, users + 1, 3):
+                yield (rng.randint(1, parties), user_id, now)
+        for batch in _batches(attendance_rows()):
+            conn.exec_driver_sql("INSERT INTO attendance (party_id, user_id, joined_at) VALUES (?, ?, ?)", batch)
+            conn.exec_driver_sql(
+                "UPDATE user SET current_party_id = ? WHERE id = ?", [(party_id, user_id) for party_id, user_id, _ in batch])
+            conn.commit()
+        conn.exec_driver_sql(
+            "UPDATE party SET attendee_count = (SELECT COUNT(*) FROM attendance WHERE attendance.party_id = party.id)")
+        conn.commit()
+    engine.dispose()
+
+# Server under test
+
+_statements = contextvars.ContextVar("benchmark_statements", default=None)
+
+def load_app():
+    """Import main with token verification stubbed out, and count SQL statements per request"""
+    from fastapi import Header, Request
+    from sqlalchemy import event
+
+    import main
+    import IDVerification
+    from database import engine
+
+    def stub_verify_firebase_token(authorization: str = Header(...)):
+        # "Bearer <uid>" authenticates as <uid>
+        return {"user_id": authorization.split()[-1]}
+
+    main.app.dependency_overrides[IDVerification.verify_firebase_token] = stub_verify_firebase_token
+    IDVerification.refresh_public_keys = lambda: None
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        counter = _statements.get()
+        if counter is not None:
+            counter[0] += 1
+
+    @main.app.middleware("http")
+    async def statement_header(request: Request, call_next):
+        # Sync routes run with a copy of this context, so they share the same list
+        counter = [0]
+        _statements.set(counter)
+        response = await call_next(request)
+        response.headers["X-DB-Statements"] = str(counter[0])
+        return response
+
+    return main.app
+
+def serve(port: int, db_path: str) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # The lifecycle sweep and archiver would end and move parties of the dataset mid-run
+    os.environ.setdefault("PARTY_SWEEP_INTERVAL", "0")
+    # Run from the dataset's directory so nothing touches the real database.db
+    os.chdir(os.path.dirname(db_path))
+    uvicorn.run(load_app(), host="127.0.0.1", port=port, log_level="warning")
+
+def start_server(port: int, db_path: str) -> multiprocessing.Process:
+    server = multiprocessing.Process(target=serve, args=(port, db_path), daemon=True)
+    server.start()
+    while True:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        if not server.is_alive():
+            raise RuntimeError("benchmark server failed to start")
+        time.sleep(0.1)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Load generation
+
+def auth(uid: str) -> dict:
+    return {"Authorization": f"Bearer {uid}"}
+
+class Workload:
+    """Weighted request mix for one virtual client, which acts as one user"""
+
+    def __init__(self, rng: random.Random, parties: int, users: int, client_number: int):
+        self.rng = rng
+        self.parties = parties
+        # generate_dataset seats users 1, 4, 7, ... at parties; clients use the
+        # users in between so their joins are not rejected
+        self.uid = f"user{(client_number * 3 + 2) % users or 2}"
+        self.joined = None
+
+    def next(self):
+        rng = self.rng
+        if self.joined is not None:
+            party_id, self.joined = self.joined, None
+            return "leave", "POST", f"/parties/{party_id}/leave", None
+        lat, lng = rng.choice(CITIES)
+        scenario = rng.choices(
+            ["list", "filter_radius", "filter_search", "detail", "join", "saved"],
+            weights=[20, 25, 15, 25, 5, 10],
+        )[0]
+        if scenario == "list":
+            return scenario, "GET", "/parties", None
+        if scenario == "filter_radius":
+            return scenario, "POST", "/parties/filter", {
+                "location_radius": {"lat": lat + rng.uniform(-0.05, 0.05), "lng": lng + rng.uniform(-0.05, 0.05),
+                                    "radius_km": rng.choice([2, 5, 10])},
+                "sort_by": "distance",
+            }
+        if scenario == "filter_search":
+            return scenario, "POST", "/parties/filter", {"hashtags": rng.choice(HASHTAGS + WORDS), "sort_by": "phrase"}
+        if scenario == "detail":
+            return scenario, "GET", f"/parties/{rng.randint(1, self.parties)}", None
+        if scenario == "join":
+            self.joined = rng.randint(1, self.parties)
+            return scenario, "POST", f"/parties/{self.joined}/join", None
+        return scenario, "GET", "/users/saved-parties", None
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+async def run_level(client: httpx.AsyncClient, args, concurrency: int) -> dict:
+    samples = {}
+    loop_latencies = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(number: int):
+        nonlocal errors
+        workload = Workload(random.Random(args.seed + number), args.parties, args.users, number)
+        while time.perf_counter() < deadline:
+            scenario, method, path, body = workload.next()
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=auth(workload.uid))
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                errors += 1
+                if scenario == "join":
+                    workload.joined = None
+            statements = int(response.headers.get("X-DB-Statements", 0))
+            samples.setdefault(scenario, []).append((elapsed, statements))
+
+    async def loop_probe():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await client.get("/cache-stats")
+            loop_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.05)
+
+    await asyncio.gather(loop_probe(), *(worker(number) for number in range(concurrency)))
+
+    endpoints = {}
+    for scenario, values in sorted(samples.items()):
+        latencies = [elapsed for elapsed, _ in values]
+        endpoints[scenario] = {
+            "requests": len(values),
+            "rps": len(values) / args.duration,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "statements": sum(statements for _, statements in values) / len(values),
+        }
+    total = sum(len(values) for values in samples.values())
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": total / args.duration,
+        "loop_p95_ms": percentile(loop_latencies, 95) * 1000,
+        "endpoints": endpoints,
+    }
+
+def print_level(result: dict) -> None:
+    print(f"\n{result['concurrency']} clients: {result['rps']:.1f} req/s, {result['requests']} requests, "
+          f"{result['errors']} errors, loop p95 {result['loop_p95_ms']:.1f} ms")
+    print(f"  {'endpoint':<14} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'stmts':>6}")
+    for name, endpoint in result["endpoints"].items():
+        print(f"  {name:<14} {endpoint['requests']:>9} {endpoint['rps']:>8.1f} {endpoint['p50_ms']:>8.1f} "
+              f"{endpoint['p95_ms']:>8.1f} {endpoint['p99_ms']:>8.1f} {endpoint['statements']:>6.1f}")
+
+async def main_async(args) -> list:
+    server = start_server(args.port, args.db)
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 1)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120, limits=limits) as client:
+            for concurrency in args.concurrency:
+                result = await run_level(client, args, concurrency)
+                print_level(result)
+                results.append(result)
+    finally:
+        server.terminate()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="10k")
+    parser.add_argument("--parties", type=int, default=None, help="override the dataset's party count")
+    parser.add_argument("--users", type=int, default=None, help="override the dataset's user count")
+    parser.add_argument("--db", default=None, help="SQLite file to use, generated if it does not exist")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--json", default=None, help="also write results to this file")
+    args = parser.parse_args()
+    args.parties = args.parties or DATASETS[args.dataset]["parties"]
+    args.users = args.users or DATASETS[args.dataset]["users"]
+    args.port = args.port or free_port()
+    args.db = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="party-bench-"), "database.db"))
+
+    if not os.path.exists(args.db):
+        started = time.perf_counter()
+        generate_dataset(args.db, args.parties, args.users, args.seed)
+        print(f"Generated {args.parties} parties / {args.users} users in {time.perf_counter() - started:.1f}s -> {args.db}")
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"dataset": {"parties": args.parties, "users": args.users}, "levels": results}, out, indent=2)
+
+if __name__ == "__main__":
+    main()
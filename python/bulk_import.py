@@ -0,0 +1,165 @@
+"""Streaming bulk importer for parties and users.
+
+Reads NDJSON (one object per line) or CSV with a header row, validates every
+row against the Party/User models and inserts them in fixed-size batches,
+one transaction per batch, so memory stays flat however large the file is:
+
+    python bulk_import.py parties nyc_parties.ndjson
+    python bulk_import.py users users.csv --batch-size 5000 --database-url sqlite:///other.db
+
+Rows that fail validation are reported with their line number and skipped
+(or abort the run with --strict). Ids are always assigned by the database,
+and so are the columns the API maintains itself: a party's attendee_count
+starts at 0 (attendance is not imported), it is active until the sweep ends
+it, and every row starts at version 1. Users imported with isHost get their
+Host row in the same batch, like POST /users/become-host creates it.
+
+For parties, the per-row R*Tree and FTS5 sync triggers are dropped for the
+duration of the import and the imported rows are indexed in two set-based
+statements at the end. Run it against a database the API is not writing to
+at the same time: party updates made by other writers during the import
+would not reach the search and spatial indexes.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+import datetime as dt
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlmodel import create_engine
+
+import models
+import spatial
+import search
+
+MODELS = {"parties": models.Party, "users": models.User}
+DEFAULT_BATCH_SIZE = 2000
+# Columns the database or the API fill in, never taken from the file
+SERVER_MANAGED = {
+    models.Party: {"id", "attendee_count", "is_active", "version"},
+    models.User: {"id", "version"},
+}
+
+def read_rows(path: str, fmt: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, raw row) pairs without loading the file"""
+    with open(path, newline="", encoding="utf-8") as source:
+        if fmt == "csv":
+            reader = csv.DictReader(source)
+            for row in reader:
+                # Empty CSV cells mean NULL, not ""
+                yield reader.line_num, {key: (None if value == "" else value) for key, value in row.items()}
+        else:
+            for line_number, line in enumerate(source, start=1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+
+def validate(model, raw: dict) -> dict:
+    """Validate one raw row and return the column values to insert"""
+    if model is models.User and isinstance(raw.get("saved_party_ids"), list):
+        raw = {**raw, "saved_party_ids": json.dumps(raw["saved_party_ids"])}
+    row = model.model_validate(raw).model_dump(exclude=SERVER_MANAGED[model])
+    # Timestamps are stored as naive UTC, a value with an offset is converted first
+    return {
+        key: value.astimezone(dt.UTC).replace(tzinfo=None)
+        if isinstance(value, dt.datetime) and value.tzinfo is not None else value
+        for key, value in row.items()
+    }
+
+@contextmanager
+def deferred_party_indexes(engine):
+    """Drop the party_rtree/party_fts sync triggers, then index the new rows in bulk"""
+    with engine.begin() as conn:
+        first_new_id = (conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM party")).scalar() or 0)
+        for trigger in spatial.RTREE_TRIGGER_NAMES + search.FTS_TRIGGER_NAMES:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    try:
+        yield
+    finally:
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"{spatial.RTREE_REBUILD_SQL} AND id > :first_new_id"), {"first_new_id": first_new_id}
+            )
+            conn.execute(
+                text(
+                    "INSERT INTO party_fts(rowid, name, description, hashtags) "
+                    "SELECT id, name, description, hashtags FROM party WHERE id > :first_new_id"
+                ),
+                {"first_new_id": first_new_id},
+            )
+            for statement in spatial.RTREE_TRIGGERS_DDL + search.FTS_TRIGGERS_DDL:
+                conn.execute(text(statement))
+
+def import_file(engine, kind: str, path: str, fmt: str, batch_size: int, strict: bool) -> dict:
+    model = MODELS[kind]
+    table = model.__table__
+    stats = {"imported": 0, "rejected": 0}
+    started = time.perf_counter()
+
+    def flush(batch):
+        with engine.begin() as conn:
+            if model is models.User:
+                ids = conn.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), batch).scalars()
+                hosts = [{"user_id": user_id} for user_id, row in zip(ids, batch) if row.get("isHost")]
+                if hosts:
+                    conn.execute(insert(models.Host.__table__), hosts)
+            else:
+                conn.execute(insert(table), batch)
+        stats["imported"] += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"\r{stats['imported']} rows, {stats['imported'] / elapsed:,.0f} rows/s", end="", file=sys.stderr)
+
+    maintenance = deferred_party_indexes(engine) if kind == "parties" else _nothing()
+    with maintenance:
+        batch = []
+        for line_number, raw in read_rows(path, fmt):
+            try:
+                batch.append(validate(model, raw))
+            except ValidationError as e:
+                stats["rejected"] += 1
+                message = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+                print(f"\nline {line_number}: {message}", file=sys.stderr)
+                if strict:
+                    raise SystemExit(1)
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = stats["imported"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(file=sys.stderr)
+    return stats
+
+@contextmanager
+def _nothing():
+    yield
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=sorted(MODELS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL / database.py")
+    parser.add_argument("--strict", action="store_true", help="stop at the first invalid row")
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+
+    stats = import_file(engine, args.kind, args.path, fmt, args.batch_size, args.strict)
+    print(f"Imported {stats['imported']} {args.kind} ({stats['rejected']} rejected) "
+          f"in {stats['seconds']:.1f}s, {stats['rows_per_second']:,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import threading
+
+_MISSING = object()
+
+class StatsCache:
+    """Thread-safe wrapper around a cachetools cache that counts hits and misses.
+
+    Routes run in worker threads as well as on the event loop, and cachetools
+    caches are not safe for concurrent use on their own.
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._cache.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def pop_where(self, predicate) -> int:
+        """Drop every entry whose (key, value) matches predicate, returns how many"""
+        with self._lock:
+            keys = [key for key, value in self._cache.items() if predicate(key, value)]
+            for key in keys:
+                self._cache.pop(key, None)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+            }
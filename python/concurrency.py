@@ -0,0 +1,71 @@
+"""Optimistic concurrency for the routes that read, modify and write rows.
+
+Party and User carry a version column (SQLAlchemy's version_id_col), so every
+ORM flush is a compare-and-swap: UPDATE ... WHERE id = ? AND version = ?. A
+request that loses the race gets StaleDataError at commit; retry_on_conflict
+rolls it back and runs the whole route again after a short jittered backoff,
+reading fresh rows, up to OCC_MAX_ATTEMPTS times before answering 409.
+"""
+import functools
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy.orm.exc import StaleDataError
+
+import IDVerification
+
+OCC_MAX_ATTEMPTS = int(os.getenv("OCC_MAX_ATTEMPTS", "5"))
+# Backoff before retry n is uniform in [0, OCC_BACKOFF_MS * 2**n)
+OCC_BACKOFF_MS = float(os.getenv("OCC_BACKOFF_MS", "5"))
+
+class ConflictStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = defaultdict(int)   # operation -> runs that returned or lost a version check
+        self.conflicts = defaultdict(int)  # operation -> version checks lost
+        self.exhausted = defaultdict(int)  # operation -> requests answered 409
+
+    def record(self, operation: str, conflict: bool, exhausted: bool = False) -> None:
+        with self._lock:
+            self.attempts[operation] += 1
+            self.conflicts[operation] += conflict
+            self.exhausted[operation] += exhausted
+
+    def samples(self, counter: str):
+        with self._lock:
+            return [({"operation": operation}, count) for operation, count in sorted(getattr(self, counter).items())]
+
+stats = ConflictStats()
+
+def retry_on_conflict(route):
+    """Rerun a sync route whose commit lost a version check, the route needs `sesh` and `token_data` kwargs.
+
+    Routes must only cause side effects (cache invalidation, publishing) after
+    their commit succeeded, everything before it is rolled back and redone.
+    """
+    operation = route.__name__
+
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        sesh = kwargs["sesh"]
+        for attempt in range(OCC_MAX_ATTEMPTS):
+            try:
+                result = route(*args, **kwargs)
+            except StaleDataError:
+                sesh.rollback()
+                # The cached user snapshot may be the stale copy, read the row next time
+                IDVerification.invalidate_user(kwargs["token_data"]["user_id"])
+                last = attempt == OCC_MAX_ATTEMPTS - 1
+                stats.record(operation, conflict=True, exhausted=last)
+                if last:
+                    raise HTTPException(status_code=409, detail="Conflicting concurrent update, try again")
+                time.sleep(random.uniform(0, OCC_BACKOFF_MS * 2 ** attempt) / 1000)
+                continue
+            stats.record(operation, conflict=False)
+            return result
+
+    return wrapper
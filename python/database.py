@@ -1,9 +1,76 @@
 from sqlmodel import SQLModel, create_engine, Session
-from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+import os
+
+# Database settings, all overridable from the environment
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# How long a connection waits on a locked database before raising "database is locked"
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# WAL lets readers keep going while a writer commits
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+# NORMAL is durable across application crashes in WAL mode and skips most fsyncs
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+# Page cache per connection, negative values are KiB
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-64000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Worker threads available to sync (database) routes
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", "40"))
+
+# Statement profiling, see query_profile.py
+DB_PROFILE = os.getenv("DB_PROFILE", "0").lower() in ("1", "true", "yes")
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+# Fraction of statements timed and aggregated
+DB_PROFILE_SAMPLE_RATE = float(os.getenv("DB_PROFILE_SAMPLE_RATE", "1.0"))
+# How long the EXPLAIN QUERY PLAN of a slow statement is reused
+DB_PROFILE_EXPLAIN_INTERVAL = float(os.getenv("DB_PROFILE_EXPLAIN_INTERVAL", "300"))
+
+def _engine_options(url: str) -> dict:
+    if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+        # An in-memory database only exists on the connection that created it, share that one connection
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        # Sessions are opened in one worker thread and may be used in another
+        "connect_args": {"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000},
+    }
 
 # Create the engine once and share it
-engine = create_engine("sqlite:///database.db")
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+
+@event.listens_for(engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+query_profile = None
+if DB_PROFILE:
+    from query_profile import QueryProfile
+    query_profile = QueryProfile(DB_SLOW_QUERY_MS, DB_PROFILE_SAMPLE_RATE, DB_PROFILE_EXPLAIN_INTERVAL)
+    query_profile.install(engine)
+
+def init_db():
+    """Create missing tables, run once per process from the app's lifespan rather than at import"""
+    # The models (and the spatial/search DDL hooks) must be imported first
+    SQLModel.metadata.create_all(engine)
 
 def get_db_session():
     # Create a new session for each call
-    return Session(engine)
\ No newline at end of file
+    return Session(engine)
+
+def get_session():
+    """FastAPI dependency that yields one session per request and closes it afterwards"""
+    with Session(engine) as session:
+        yield session
@@ -0,0 +1,37 @@
+"""Strong ETags for party responses and If-None-Match handling.
+
+A party's version is (id, updated_at, attendee_count): every write to a party
+row bumps updated_at and attendee_count moves with every join and leave. A
+response's ETag hashes the versions of the parties in it plus the request
+shape, so a conditional GET is answered with 304 from those few columns,
+before hosts or attendees are loaded or anything is serialized.
+"""
+import hashlib
+
+from fastapi import Response
+
+# Columns a query adds with party_columns(fields, *VERSION_FIELDS) to tag its rows
+VERSION_FIELDS = ("updated_at", "attendee_count")
+# Clients and caches may keep the body but have to revalidate it every time
+CACHE_CONTROL = "private, no-cache"
+
+def party_versions(rows) -> list:
+    return [(row.id, row.updated_at, row.attendee_count) for row in rows]
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest() + '"'
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so a W/ prefix still matches"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def tag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from typing import Iterable
+from cachetools import TTLCache
+from cache import StatsCache
+from spatial import bounding_boxes
+
+FILTER_CACHE_SIZE = int(os.getenv("FILTER_CACHE_SIZE", "1000"))
+FILTER_CACHE_TTL = int(os.getenv("FILTER_CACHE_TTL", "30"))
+# Search centers are rounded to this many decimals (3 is ~110 m) so nearby
+# users share cache entries
+FILTER_CACHE_COORD_DECIMALS = int(os.getenv("FILTER_CACHE_COORD_DECIMALS", "3"))
+
+# normalized filters -> (response, party ids in it, radius bounding boxes or None,
+# whether attendance counts decide which parties it holds)
+filter_cache = StatsCache(TTLCache(maxsize=FILTER_CACHE_SIZE, ttl=FILTER_CACHE_TTL, timer=time.time))
+# Bumped by every invalidation, a result whose query ran across one is not stored
+_generation = 0
+_generation_lock = threading.Lock()
+
+def normalize(filters):
+    """Copy of the filters with the search center quantized and hashtags canonicalized.
+
+    The query runs on the normalized filters too, so every client that shares an
+    entry gets exactly the result that was cached.
+    """
+    updates = {}
+    if filters.location_radius:
+        location = dict(filters.location_radius)
+        for coordinate in ("lat", "lng"):
+            if location.get(coordinate) is not None:
+                location[coordinate] = round(location[coordinate], FILTER_CACHE_COORD_DECIMALS)
+        updates["location_radius"] = location
+    if filters.hashtags:
+        updates["hashtags"] = " ".join(sorted(set(filters.hashtags.lower().split())))
+    return filters.model_copy(update=updates)
+
+def cache_key(filters) -> str:
+    return json.dumps(filters.model_dump(), sort_keys=True, default=str)
+
+def get(key: str):
+    entry = filter_cache.get(key)
+    return entry[0] if entry is not None else None
+
+def generation() -> int:
+    """Take before running the query whose result is passed to store()"""
+    return _generation
+
+def store(key: str, response: dict, party_ids: Iterable[int], generation: int, center=None,
+          by_attendance: bool = False) -> None:
+    """Cache a result unless a write invalidated the cache since its query started"""
+    boxes = bounding_boxes(*center) if center else None
+    with _generation_lock:
+        if generation == _generation:
+            filter_cache.set(key, (response, frozenset(party_ids), boxes, by_attendance))
+
+def _bump() -> None:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+def _in_boxes(boxes, lat: float, lng: float) -> bool:
+    return any(
+        min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        for min_lat, max_lat, min_lng, max_lng in boxes
+    )
+
+def invalidate_party(party_id: int, attendance: bool = False) -> int:
+    """Drop cached results that contain a party whose fields or attendance changed.
+
+    A join or leave can also move a party into popularity sorted or tickets-left
+    filtered results it was not part of, so those are dropped as well.
+    """
+    _bump()
+    return filter_cache.pop_where(lambda key, entry: party_id in entry[1] or (attendance and entry[3]))
+
+def invalidate_parties(party_ids) -> int:
+    """invalidate_party for many parties at once, one pass over the cache"""
+    _bump()
+    party_ids = set(party_ids)
+    return filter_cache.pop_where(lambda key, entry: not party_ids.isdisjoint(entry[1]))
+
+def invalidate_new_party(latitude: float | None, longitude: float | None) -> int:
+    """Drop cached results a newly created party could appear in: every entry
+    without a location filter, plus location entries whose area covers it."""
+    _bump()
+    def affected(key, entry):
+        boxes = entry[2]
+        if boxes is None:
+            return True
+        return latitude is not None and longitude is not None and _in_boxes(boxes, latitude, longitude)
+    return filter_cache.pop_where(affected)
+
+def stats() -> dict:
+    return filter_cache.stats()
@@ -0,0 +1,158 @@
+"""Background sweep that ends parties once their end_time has passed.
+
+Started from the app's lifespan. Every PARTY_SWEEP_INTERVAL seconds it takes
+active parties past their end_time in batches of PARTY_SWEEP_BATCH_SIZE and,
+in one short write transaction per batch:
+
+- marks them inactive (is_active = 0),
+- clears current_party_id of the users still recorded at them,
+- adds them to their host's parties_thrown, cancelled parties excepted.
+
+Everything is set-based, a handful of statements per batch however many
+attendees there are. The sweep runs in a worker thread and releases the
+SQLite write lock between batches, so requests keep being served. Flipping
+is_active is conditional on it still being set, so several workers sweeping
+the same database never count a party twice.
+
+After each sweep the same loop moves long-ended parties to the archive, see
+archive.py.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+import datetime as dt
+from typing import List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, func
+from sqlmodel import Session, select, update
+
+import IDVerification
+import archive
+import filter_cache
+import models
+import pubsub
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps, 0 turns the sweep off
+PARTY_SWEEP_INTERVAL = float(os.getenv("PARTY_SWEEP_INTERVAL", "60"))
+PARTY_SWEEP_BATCH_SIZE = int(os.getenv("PARTY_SWEEP_BATCH_SIZE", "500"))
+
+class SweepStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sweeps = 0
+        self.parties_ended = 0
+        self.users_cleared = 0
+        self.last_seconds = 0.0
+
+    def record(self, parties: int, users: int, seconds: float) -> None:
+        with self._lock:
+            self.sweeps += 1
+            self.parties_ended += parties
+            self.users_cleared += users
+            self.last_seconds = seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sweeps": self.sweeps,
+                "parties_ended": self.parties_ended,
+                "users_cleared": self.users_cleared,
+                "last_seconds": self.last_seconds,
+            }
+
+stats = SweepStats()
+
+# WHERE clause of the listings, which drop a party as soon as a sweep ends it.
+# Nearly every row in party is active since ended ones get archived, likely()
+# tells SQLite so, and it keeps walking the ORDER BY index instead of sorting
+# every row ix_party_is_active_end_time finds.
+ACTIVE = func.likely(models.Party.is_active)
+
+def end_expired_parties(db: Session, now: datetime, limit: int) -> tuple[List[int], List[str]]:
+    """End one batch of expired parties, returns their ids and the firebase uids of the users cleared.
+
+    Does not commit, the caller commits and then drops those users from the cache.
+    """
+    Party, User, Host = models.Party, models.User, models.Host
+    candidates = db.exec(
+        select(Party.id).where(Party.is_active, Party.end_time < now).order_by(Party.end_time).limit(limit)
+    ).all()
+    if not candidates:
+        return [], []
+    # Only the rows this transaction flips count, a concurrent sweep may have taken some
+    ended = db.exec(
+        update(Party)
+        .where(Party.id.in_(candidates), Party.is_active)
+        .values(is_active=False, updated_at=now, version=Party.version + 1)
+        .returning(Party.id, Party.host_id, Party.start_time, Party.end_time)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not ended:
+        return [], []
+    party_ids = [party.id for party in ended]
+
+    cleared = db.exec(
+        update(User)
+        .where(User.current_party_id.in_(party_ids))
+        .values(current_party_id=None, updated_at=now, version=User.version + 1)
+        .returning(User.firebase_uid)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    # cancel_party sets end_time = start_time, those were never thrown
+    thrown = Counter(party.host_id for party in ended if party.start_time is None or party.start_time != party.end_time)
+    if thrown:
+        host = Host.__table__
+        db.connection().execute(
+            host.update()
+            .where(host.c.id == bindparam("host"))
+            .values(parties_thrown=host.c.parties_thrown + bindparam("thrown")),
+            [{"host": host_id, "thrown": count} for host_id, count in thrown.items()],
+        )
+    return party_ids, [uid for uid in cleared if uid is not None]
+
+def sweep(batch_size: int = PARTY_SWEEP_BATCH_SIZE) -> int:
+    """End every party past its end_time, one transaction per batch, returns how many were ended"""
+    started = time.perf_counter()
+    # Timestamps are stored as naive UTC
+    now = datetime.now(dt.UTC).replace(tzinfo=None)
+    parties = users = 0
+    while True:
+        with Session(engine) as db:
+            party_ids, uids = end_expired_parties(db, now, batch_size)
+            db.commit()
+        for uid in uids:
+            IDVerification.invalidate_user(uid)
+        if party_ids:
+            filter_cache.invalidate_parties(party_ids)
+        for party_id in party_ids:
+            pubsub.broker.publish(party_id, {"type": "ended", "party_id": party_id})
+        parties += len(party_ids)
+        users += len(uids)
+        if len(party_ids) < batch_size:
+            break
+    stats.record(parties, users, time.perf_counter() - started)
+    return parties
+
+async def run_forever(interval: float = PARTY_SWEEP_INTERVAL) -> None:
+    while True:
+        try:
+            ended = await run_in_threadpool(sweep)
+            if ended:
+                logger.info("ended %d parties", ended)
+            # Archiving only takes parties the sweep has already ended
+            if archive.PARTY_ARCHIVE:
+                archived = await run_in_threadpool(archive.archive)
+                if archived:
+                    logger.info("archived %d parties", archived)
+        except Exception:
+            logger.warning("Party lifecycle sweep failed", exc_info=True)
+        await asyncio.sleep(interval)
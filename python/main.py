@@ -1,70 +1,217 @@
-import firebase_admin
-from firebase_admin import credentials, auth
-from fastapi import FastAPI, Depends, HTTPException
-from database import engine, SQLModel, get_db_session
-from sqlmodel import Session, select, or_, and_
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Header, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from database import engine, get_session, DB_THREADPOOL_SIZE
+import database
+from sqlmodel import Session, select, or_
 import models
-from models import get_attendee_ids, add_attendee, remove_attendee, get_saved_party_ids, add_saved_party, remove_saved_party, Host
+from models import get_attendees_by_party, get_archived_attendees_by_party, get_users_by_ids, get_parties_by_ids, add_attendee, remove_attendee, get_saved_party_ids, add_saved_party, remove_saved_party, Host
 import IDVerification
-from sqlalchemy import case
 from http import HTTPStatus
 from datetime import datetime
 from typing import List
 from pydantic import BaseModel
 from sqlmodel import Field
 import datetime as dt
+import asyncio
+import json
+import anyio
+from pagination import clamp_limit, decode_cursor, after_cursor_desc, take_page, MAX_PAGE_SIZE
+from serializers import parse_fields, party_columns, archive_columns, serialize_party, LIST_FIELDS, FILTER_FIELDS, DETAIL_FIELDS, LIST_SUPPORTED
+from spatial import calculate_distance, parties_near
+import search
+import filter_cache
+import party_snapshot
+from streaming import stream_parties
+import metrics
+import pubsub
+import startup
+import etags
+import concurrency
+import lifecycle
+import archive
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Nothing connects to the database or Firebase at import, so forked workers start clean"""
+    startup.state.begin()
+    # Routes that touch the database are plain `def`, so FastAPI runs them in its
+    # worker threadpool and a slow query never blocks the event loop.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = DB_THREADPOOL_SIZE
+    pubsub.broker.bind(asyncio.get_running_loop())
+    with startup.state.phase("create_tables"):
+        await run_in_threadpool(database.init_db)
+    # Requests are served from here on, /ready says when the warmup is done
+    tasks = [asyncio.create_task(_warm_up())]
+    if lifecycle.PARTY_SWEEP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(lifecycle.run_forever()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _warm_up():
+    if party_snapshot.snapshot is not None:
+        with startup.state.phase("party_snapshot", optional=True):
+            await run_in_threadpool(_load_party_snapshot)
+    # Without fresh keys from the warmup the refresh loop fetches them right away
+    key_refresh_delay = 0
+    if startup.STARTUP_WARMUP:
+        with startup.state.phase("database", optional=True):
+            await run_in_threadpool(_warm_database, startup.WARMUP_CONNECTIONS)
+        with startup.state.phase("signing_keys", optional=True):
+            max_age = await asyncio.wait_for(
+                run_in_threadpool(IDVerification.refresh_public_keys), startup.WARMUP_KEY_TIMEOUT
+            )
+            key_refresh_delay = IDVerification.refresh_delay(max_age)
+    startup.state.mark_ready()
+    # Keep Google's token signing keys warm off the request path
+    await IDVerification.refresh_public_keys_forever(delay=key_refresh_delay)
+
+def _load_party_snapshot():
+    with Session(engine) as sesh:
+        party_snapshot.snapshot.load(sesh)
+
+def _warm_database(connections: int):
+    """Open pooled connections and run the hot read paths on each of them.
+
+    That does the per-connection PRAGMAs, fills SQLAlchemy's compiled cache and
+    each sqlite3 connection's prepared statement cache, and pulls the indexes
+    those queries use into the page cache. The default feed is also computed
+    once so the first /parties/filter request is a result cache hit.
+    """
+    sessions = [Session(engine) for _ in range(max(connections, 1))]
+    try:
+        # Every session holds its connection until closed, so each one gets its own
+        for sesh in sessions:
+            IDVerification.get_user_by_firebase_uid(sesh, "")
+            get_parties(Response(), limit=None, cursor=None, fields=None, stream=None, if_none_match=None, token_data={}, sesh=sesh)
+            _party_details(sesh, [0], DETAIL_FIELDS)
+        filter_parties(PartyFilters(), token_data={}, sesh=sessions[0])
+    finally:
+        for sesh in sessions:
+            sesh.close()
+
+app  = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe, 503 until the startup warmup has finished"""
+    report = startup.state.report()
+    return report if report["ready"] else JSONResponse(report, status_code=503)
+
+def _cache_stats() -> dict:
+    return {**IDVerification.cache_stats(), "filter_cache": filter_cache.stats()}
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """Hit/miss counters for the in-process caches"""
+    return {**_cache_stats(), "party_snapshot": party_snapshot.stats(), "pubsub": pubsub.broker.stats()}
+
+def _cache_samples(stat: str):
+    return [({"cache": name}, stats[stat]) for name, stats in _cache_stats().items()]
+
+metrics.registry.collector("cache_hits_total", "counter", "In-process cache hits", lambda: _cache_samples("hits"))
+metrics.registry.collector("cache_misses_total", "counter", "In-process cache misses", lambda: _cache_samples("misses"))
+metrics.registry.collector("cache_entries", "gauge", "In-process cache entries", lambda: _cache_samples("size"))
+metrics.registry.collector(
+    "occ_attempts_total", "counter", "Optimistic transactions run, retries included",
+    lambda: concurrency.stats.samples("attempts")
+)
+metrics.registry.collector(
+    "occ_conflicts_total", "counter", "Optimistic transactions that lost a version check",
+    lambda: concurrency.stats.samples("conflicts")
+)
+metrics.registry.collector(
+    "occ_retries_exhausted_total", "counter", "Requests answered 409 after OCC_MAX_ATTEMPTS conflicts",
+    lambda: concurrency.stats.samples("exhausted")
+)
+for name, kind, help, stat in (
+    ("party_sweeps_total", "counter", "Party lifecycle sweeps run", "sweeps"),
+    ("party_sweep_parties_ended_total", "counter", "Parties ended by the lifecycle sweep", "parties_ended"),
+    ("party_sweep_users_cleared_total", "counter", "current_party_id values cleared by the lifecycle sweep", "users_cleared"),
+    ("party_sweep_last_seconds", "gauge", "Duration of the last lifecycle sweep", "last_seconds"),
+):
+    metrics.registry.collector(name, kind, help, lambda stat=stat: [({}, lifecycle.stats.stats()[stat])])
+for name, kind, help, stat in (
+    ("party_archive_parties_total", "counter", "Parties moved to party_archive", "parties"),
+    ("party_archive_attendance_total", "counter", "Attendance rows moved to attendance_archive", "attendance"),
+    ("party_archive_last_seconds", "gauge", "Duration of the last archive run", "last_seconds"),
+):
+    metrics.registry.collector(name, kind, help, lambda stat=stat: [({}, archive.stats.stats()[stat])])
+metrics.registry.collector(
+    "startup_seconds", "gauge", "Import time, startup phases and start-to-ready time", startup.state.samples
+)
+if hasattr(engine.pool, "checkedout"):
+    metrics.registry.collector(
+        "db_pool_checked_out", "gauge", "Database connections in use", lambda: [({}, engine.pool.checkedout())]
+    )
 
-SQLModel.metadata.create_all(engine)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of the request, database and cache metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
-me = credentials.Certificate("houseparty-26abf-firebase-adminsdk-fbsvc-529fbe0b54.json")
-firebase_admin.initialize_app(me)
-app  = FastAPI()
+@app.get("/db-profile")
+def db_profile(top: int = 20, order_by: str = "total_ms"):
+    """Top statements seen by the DB_PROFILE statement profiler"""
+    if database.query_profile is None:
+        raise HTTPException(status_code=404, detail="Statement profiling is off, set DB_PROFILE=1")
+    if order_by not in ("total_ms", "max_ms", "avg_ms", "calls", "slow_calls"):
+        raise HTTPException(status_code=400, detail="order_by must be total_ms, max_ms, avg_ms, calls or slow_calls")
+    return {"statements": database.query_profile.report(top, order_by)}
 
 @app.post("/create-custom-token")
-async def create_custom_token(user_id: str):
+def create_custom_token(user_id: str):
     try:
-        custom_token = auth.create_custom_token(user_id)
+        custom_token = IDVerification.firebase_auth().create_custom_token(user_id)
         return {"custom_token": custom_token.decode('utf-8')}
     except Exception as e:
         return {"error": str(e)}
 
 @app.post("/register")
-async def register(userdata : models.newUser, token_data: dict = Depends(IDVerification.verify_firebase_token)):
-    with get_db_session() as Sesh:
-        existing_user = await IDVerification.get_user_by_firebase_uid(Sesh, token_data['user_id'])
-        if existing_user:
-            raise HTTPException(status_code=409, detail="User already exists")
-        
-        # Create new user in database
-        new_user = models.User(
-            firebase_uid=token_data['user_id'],
-            email=userdata.email,
-            username=userdata.username,
-            phone=userdata.phone,
-            bio=userdata.bio,
-            isHost=False
-        )
-        Sesh.add(new_user)
-        Sesh.commit()
-        
-        return {"message": "User registered successfully", "id" : new_user.id}
+def register(userdata : models.newUser, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
+    existing_user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if existing_user:
+        raise HTTPException(status_code=409, detail="User already exists")
+    
+    # Create new user in database
+    new_user = models.User(
+        firebase_uid=token_data['user_id'],
+        email=userdata.email,
+        username=userdata.username,
+        phone=userdata.phone,
+        bio=userdata.bio,
+        isHost=False
+    )
+    sesh.add(new_user)
+    sesh.commit()
+    IDVerification.invalidate_user(token_data['user_id'])
+    
+    return {"message": "User registered successfully", "id" : new_user.id}
 
 @app.post("/login")
-async def login(token : dict = Depends(IDVerification.verify_firebase_token)):
-    with get_db_session() as sesh:
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token["user_id"])
-        if user:
-            return {
-                "message": "Login successful",
-                "user": {
-                    "id": user.id,
-                    "email": user.email,
-                    "username": user.username,
-                    "bio": user.bio,
-                }
+def login(token : dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
+    user = IDVerification.get_user_by_firebase_uid(sesh, token["user_id"])
+    if user:
+        return {
+            "message": "Login successful",
+            "user": {
+                "id": user.id,
+                "email": user.email,
+                "username": user.username,
+                "bio": user.bio,
             }
-        else:
-            raise HTTPException(status_code=404, detail="User not found")
+        }
+    else:
+        raise HTTPException(status_code=404, detail="User not found")
 
 # Party endpoints
 class CreatePartyRequest(BaseModel):
@@ -85,440 +232,664 @@ class PartyFilters(BaseModel):
     location_radius: dict | None = None  # {"lat": 40.7128, "lng": -74.0060, "radius_km": 10}
     date_range: dict | None = None  # {"start": "2024-01-01", "end": "2024-12-31"}
     host_id: int | None = None
-    ticketsLeft: int | None = None  # {"min": 5, "max": 50}
+    ticketsLeft: int | None = None  # minimum open spots, max_attendees - attendee_count
+    limit: int | None = None
+    cursor: str | None = None  # next_cursor from the previous page
+    fields: str | None = None  # "id,name,start_time" projection
+    active_only: bool = False  # skip parties that have already ended
+    stream: str | None = None  # "ndjson" or "json", every match from cursor on in one streamed response
 
 @app.post("/parties/create")
-async def create_party(party_data: CreatePartyRequest, token_data: dict = Depends(IDVerification.verify_firebase_token)):
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        if not user.isHost:
-            raise HTTPException(status_code=403, detail="Only hosts can create parties")
-        
-        host = sesh.exec(select(Host).where(Host.user_id == user.id)).first()
-        # Create new party
-        new_party = models.Party(
-            name=party_data.name,
-            description=party_data.description,
-            host_id=host.id,
-            latitude=party_data.latitude,
-            longitude=party_data.longitude,
-            address=party_data.address,
-            start_time=party_data.start_time,
-            end_time=party_data.end_time,
-            max_attendees=party_data.max_attendees,
-            hashtags=party_data.hashtags,
-            media_url=party_data.media_url
-        )
-        
-        sesh.add(new_party)
-        sesh.commit()
-        sesh.refresh(new_party)
-        
-        return {"message": "Party created successfully", "id": new_party.id}
+def create_party(party_data: CreatePartyRequest, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if not user.isHost:
+        raise HTTPException(status_code=403, detail="Only hosts can create parties")
+    
+    host = sesh.exec(select(Host).where(Host.user_id == user.id)).first()
+    # Create new party
+    new_party = models.Party(
+        name=party_data.name,
+        description=party_data.description,
+        host_id=host.id,
+        latitude=party_data.latitude,
+        longitude=party_data.longitude,
+        address=party_data.address,
+        start_time=party_data.start_time,
+        end_time=party_data.end_time,
+        max_attendees=party_data.max_attendees,
+        hashtags=party_data.hashtags,
+        media_url=party_data.media_url
+    )
+    
+    sesh.add(new_party)
+    sesh.commit()
+    sesh.refresh(new_party)
+    filter_cache.invalidate_new_party(new_party.latitude, new_party.longitude)
+    party_snapshot.upsert(new_party)
+    
+    return {"message": "Party created successfully", "id": new_party.id}
 
 @app.post("/parties/{party_id}/join")
-async def join_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token)):
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Check if user is already at a party
-        if user.current_party_id:
-            raise HTTPException(status_code=400, detail="Already at a party. Leave current party first.")
-        
-        # Get the party
-        party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
-        if not party:
-            raise HTTPException(status_code=404, detail="Party not found")
-        
-        # Add user to attendees and set current party
-        if add_attendee(party, user.id):
-            user.current_party_id = party_id
-            sesh.commit()
-            return {"message": "Successfully joined party", "id": party_id}
-        else:
-            raise HTTPException(status_code=400, detail="Failed to join party")
+@concurrency.retry_on_conflict
+def join_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Check if user is already at a party
+    if user.current_party_id:
+        raise HTTPException(status_code=400, detail="Already at a party. Leave current party first.")
+    
+    # Get the party
+    party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
+    if not party:
+        raise HTTPException(status_code=404, detail="Party not found")
+    if not party.is_active:
+        raise HTTPException(status_code=400, detail="Party has ended")
+    
+    # Add user to attendees and set current party
+    attendee_count = add_attendee(sesh, party_id, user.id)
+    if attendee_count is not None:
+        user.current_party_id = party_id
+        sesh.commit()
+        IDVerification.invalidate_user(token_data['user_id'])
+        filter_cache.invalidate_party(party_id, attendance=True)
+        party_snapshot.add_attendees(party_id, 1)
+        pubsub.broker.publish(
+            party_id, {"type": "attendees", "party_id": party_id, "attendee_count": attendee_count, "delta": 1}
+        )
+        return {"message": "Successfully joined party", "id": party_id}
+    else:
+        raise HTTPException(status_code=400, detail="Failed to join party")
 
 @app.post("/parties/{party_id}/leave")
-async def leave_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token)):
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+@concurrency.retry_on_conflict
+def leave_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Get the party
+    party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
+    if not party:
+        raise HTTPException(status_code=404, detail="Party not found")
+    
+    # Remove user from attendees and clear current party
+    attendee_count = remove_attendee(sesh, party_id, user.id)
+    if attendee_count is not None:
+        user.current_party_id = None
+        sesh.commit()
+        IDVerification.invalidate_user(token_data['user_id'])
+        filter_cache.invalidate_party(party_id, attendance=True)
+        party_snapshot.add_attendees(party_id, -1)
+        pubsub.broker.publish(
+            party_id, {"type": "attendees", "party_id": party_id, "attendee_count": attendee_count, "delta": -1}
+        )
+        return {"message": "Successfully left party"}
+    else:
+        raise HTTPException(status_code=400, detail="Not attending this party")
+
+def _party_states(party_ids: List[int]) -> List[dict]:
+    with Session(engine) as sesh:
+        rows = sesh.exec(
+            select(models.Party.id, models.Party.attendee_count, models.Party.max_attendees, models.Party.end_time)
+            .where(models.Party.id.in_(party_ids))
+        ).all()
+    return [
+        {"party_id": row.id, "attendee_count": row.attendee_count, "max_attendees": row.max_attendees,
+         "end_time": row.end_time.isoformat() + "Z" if row.end_time else None}
+        for row in rows
+    ]
+
+async def _send_updates(websocket: WebSocket, subscriber: pubsub.Subscriber):
+    while not subscriber.closed:
+        message = await subscriber.queue.get()
+        if subscriber.closed:
+            break
+        await websocket.send_text(message)
+    # The broker dropped this subscriber for falling behind, it reconnects for a fresh snapshot
+    await websocket.close(code=1013)
+
+@app.websocket("/ws/parties")
+async def watch_parties(websocket: WebSocket):
+    """Live attendee counts. The first message authenticates, {"token": "<Firebase ID token>"}, a token
+    in the URL would end up in access logs. Then send {"subscribe": [ids]} or {"unsubscribe": [ids]}, each
+    subscribe is answered with a snapshot of those parties and then attendees/ended/cancelled events."""
+    await websocket.accept()
+    try:
+        hello = await asyncio.wait_for(websocket.receive_json(), pubsub.WS_AUTH_TIMEOUT)
+        await IDVerification.verify_token(hello["token"])
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, HTTPException, ValueError, TypeError, KeyError, AttributeError):
+        await websocket.close(code=1008)
+        return
+    subscriber = pubsub.broker.connect()
+    sender = asyncio.create_task(_send_updates(websocket, subscriber))
+    try:
+        while True:
+            request = await websocket.receive_json()
+            if request.get("unsubscribe"):
+                pubsub.broker.unsubscribe(subscriber, [int(party_id) for party_id in request["unsubscribe"]])
+            if request.get("subscribe"):
+                added = pubsub.broker.subscribe(subscriber, [int(party_id) for party_id in request["subscribe"]])
+                parties = await run_in_threadpool(_party_states, list(added)) if added else []
+                pubsub.broker.send(subscriber, json.dumps({"type": "snapshot", "parties": parties}))
+    except WebSocketDisconnect:
+        pass
+    except (ValueError, TypeError, AttributeError):
+        await websocket.close(code=1003)
+    finally:
+        pubsub.broker.disconnect(subscriber)
+        sender.cancel()
+
+@app.get("/parties")
+def get_parties(
+    response: Response,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None,
+    stream: str | None = None,
+    if_none_match: str | None = Header(None),
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
+):
+    """List parties newest first, one keyset page at a time, or all of them with stream=ndjson|json"""
+    limit = clamp_limit(limit)
+    fields = parse_fields(fields, LIST_FIELDS, LIST_SUPPORTED)
+    query = (
+        select(*party_columns(fields, "created_at", *etags.VERSION_FIELDS))
+        .where(lifecycle.ACTIVE)
+        .order_by(models.Party.created_at.desc(), models.Party.id.desc())
+    )
+    if cursor:
+        key, last_id = decode_cursor(cursor, "created_at")
+        query = query.where(after_cursor_desc(models.Party.created_at, models.Party.id, key, last_id))
+    if stream:
+        return stream_parties(query, fields, stream)
+    rows = sesh.exec(query.limit(limit + 1)).all()
+    # The extra row decides next_cursor, so it is part of the version too
+    etag = etags.make_etag(fields, limit, etags.party_versions(rows))
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    parties, next_cursor = take_page(rows, limit, "created_at", lambda row: row.created_at)
+    
+    hosts = get_users_by_ids(sesh, [party.host_id for party in parties]) if "host" in fields else {}
+    
+    party_list = [serialize_party(party, fields, hosts) for party in parties]
+    etags.tag(response, etag)
+    return {"parties": party_list, "next_cursor": next_cursor}
+
+class PartyBatchRequest(BaseModel):
+    ids: List[int]
+    fields: str | None = None  # same projection as GET /parties/{party_id}
+
+def _party_details(sesh: Session, party_ids: List[int], fields: List[str]) -> dict:
+    """Serialized parties keyed by id, one query per table however many ids are asked for"""
+    # execute(), exec() would unwrap the rows of a fields=id projection into plain ints
+    parties = sesh.execute(select(*party_columns(fields)).where(models.Party.id.in_(set(party_ids)))).all()
+    hosts = get_users_by_ids(sesh, [party.host_id for party in parties]) if "host" in fields else {}
+    attendees = get_attendees_by_party(sesh, [party.id for party in parties]) if "attendees" in fields else {}
+    return {party.id: serialize_party(party, fields, hosts, attendees=attendees) for party in parties}
+
+@app.post("/parties/batch")
+def get_parties_batch(
+    request: PartyBatchRequest,
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
+):
+    """Fetch up to MAX_PAGE_SIZE parties in one round trip, one result per requested id"""
+    if len(request.ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids per batch")
+    fields = parse_fields(request.fields, DETAIL_FIELDS)
+    parties = _party_details(sesh, request.ids, fields)
+    return {"results": [
+        {"id": party_id, "status": 200, "party": parties[party_id]} if party_id in parties
+        else {"id": party_id, "status": 404, "detail": "Party not found"}
+        for party_id in request.ids
+    ]}
+
+@app.get("/parties/history")
+def get_party_history(
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None,
+    host_id: int | None = None,
+    attended: bool = False,
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
+):
+    """Archived parties, most recently ended first, optionally one host's or the ones the caller attended"""
+    limit = clamp_limit(limit)
+    fields = parse_fields(fields, LIST_FIELDS)
+    ArchivedParty = models.ArchivedParty
+    query = select(*archive_columns(fields, "end_time")).order_by(ArchivedParty.end_time.desc(), ArchivedParty.id.desc())
+    if host_id:
+        query = query.where(ArchivedParty.host_id == host_id)
+    if attended:
+        user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get the party
-        party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
-        if not party:
-            raise HTTPException(status_code=404, detail="Party not found")
-        
-        # Remove user from attendees and clear current party
-        if remove_attendee(party, user.id):
-            user.current_party_id = None
-            sesh.commit()
-            return {"message": "Successfully left party"}
-        else:
-            raise HTTPException(status_code=400, detail="Not attending this party")
+        query = query.join(
+            models.ArchivedAttendance, models.ArchivedAttendance.party_id == ArchivedParty.id
+        ).where(models.ArchivedAttendance.user_id == user.id)
+    if cursor:
+        key, last_id = decode_cursor(cursor, "history")
+        query = query.where(after_cursor_desc(ArchivedParty.end_time, ArchivedParty.id, key, last_id))
+    parties, next_cursor = take_page(
+        sesh.exec(query.limit(limit + 1)).all(), limit, "history", lambda row: row.end_time
+    )
+    
+    hosts = get_users_by_ids(sesh, [party.host_id for party in parties]) if "host" in fields else {}
+    attendees = get_archived_attendees_by_party(sesh, [party.id for party in parties]) if "attendees" in fields else {}
+    party_list = [serialize_party(party, fields, hosts, attendees=attendees) for party in parties]
+    return {"parties": party_list, "next_cursor": next_cursor}
 
-@app.get("/parties")
-async def get_parties(token_data: dict = Depends(IDVerification.verify_firebase_token)):
-    with get_db_session() as sesh:
-        # Get all parties (you might want to add filtering/pagination)
-        parties = sesh.exec(select(models.Party)).all()
-        
-        party_list = []
-        for party in parties:
-            # Get host info
-            host = sesh.exec(select(models.User).where(models.User.id == party.host_id)).first()
-            
-            party_data = {
-                "id": party.id,
-                "name": party.name,
-                "description": party.description,
-                "host": {
-                    "id": host.id,
-                    "username": host.username
-                } if host else None,
-                "attendee_count": len(get_attendee_ids(party)),
-                "location": {
-                    "latitude": party.latitude,
-                    "longitude": party.longitude,
-                    "address": party.address
-                },
-                "start_time": party.start_time,
-                "end_time": party.end_time,
-                "max_attendees": party.max_attendees,
-                "created_at": party.created_at
-            }
-            party_list.append(party_data)
-        
-        return {"parties": party_list}
+@app.get("/parties/history/{party_id}")
+def get_archived_party(
+    party_id: int,
+    fields: str | None = None,
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
+):
+    """GET /parties/{party_id} for a party that has been archived"""
+    fields = parse_fields(fields, DETAIL_FIELDS)
+    party = sesh.execute(select(*archive_columns(fields)).where(models.ArchivedParty.id == party_id)).first()
+    if not party:
+        raise HTTPException(status_code=404, detail="Party not found")
+    hosts = get_users_by_ids(sesh, [party.host_id]) if "host" in fields else {}
+    attendees = get_archived_attendees_by_party(sesh, [party.id]) if "attendees" in fields else {}
+    return serialize_party(party, fields, hosts, attendees=attendees)
 
 @app.get("/parties/{party_id}")
-async def get_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token)):
-    with get_db_session() as sesh:
-        party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
-        if not party:
-            raise HTTPException(status_code=404, detail="Party not found")
-        
-        # Get host info
-        host = sesh.exec(select(models.User).where(models.User.id == party.host_id)).first()
-        
-        # Get attendee info
-        attendee_ids = get_attendee_ids(party)
-        attendees = []
-        for user_id in attendee_ids:
-            user = sesh.exec(select(models.User).where(models.User.id == user_id)).first()
-            if user:
-                attendees.append({
-                    "id": user.id,
-                    "username": user.username,
-                    "pfpURL": user.pfpURL
-                })
-        
-        return {
-            "id": party.id,
-            "name": party.name,
-            "description": party.description,
-            "host": {
-                "id": host.id,
-                "username": host.username
-            } if host else None,
-            "attendees": attendees,
-            "location": {
-                "latitude": party.latitude,
-                "longitude": party.longitude,
-                "address": party.address
-            },
-            "start_time": party.start_time,
-            "end_time": party.end_time,
-            "max_attendees": party.max_attendees,
-            "created_at": party.created_at
-        }
+def get_party(
+    party_id: int,
+    response: Response,
+    fields: str | None = None,
+    if_none_match: str | None = Header(None),
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
+):
+    fields = parse_fields(fields, DETAIL_FIELDS)
+    # Primary key lookup of the version columns, the host and attendees are only loaded on a miss
+    version = sesh.exec(select(*party_columns([], *etags.VERSION_FIELDS)).where(models.Party.id == party_id)).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Party not found")
+    etag = etags.make_etag(fields, etags.party_versions([version]))
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    party = _party_details(sesh, [party_id], fields).get(party_id)
+    if not party:
+        raise HTTPException(status_code=404, detail="Party not found")
+    etags.tag(response, etag)
+    return party
 
 @app.post("/parties/filter")
-async def filter_parties(
+def filter_parties(
     filters: PartyFilters,
-    token_data: dict = Depends(IDVerification.verify_firebase_token)
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
 ):
-    with get_db_session() as sesh:
-        query = select(models.Party)
-        score_conditions = []
-            # Hashtag filtering
-        if filters.hashtags:
-            search_words = filters.hashtags.lower().split()
-            search_conditions = []
-            
-            for word in search_words:
-                word_pattern = f"%{word}%"
-                word_condition = or_(
-                    models.Party.name.ilike(word_pattern),
-                    models.Party.description.ilike(word_pattern),
-                    models.Party.hashtags.ilike(word_pattern)
-                )
-
-                search_conditions.append(word_condition)
-                if filters.sort_by == "phrase" and search_conditions:
-                # Add scoring - each field match gets points
-                    score_conditions.extend([
-                        case((models.Party.name.ilike(word_pattern), 3), else_=0),      # Name matches worth 3 points
-                        case((models.Party.description.ilike(word_pattern), 1), else_=0), # Description worth 1 point  
-                        case((models.Party.hashtags.ilike(word_pattern), 2), else_=0)    # Hashtags worth 2 points
-                    ])
-                    total_score = sum(score_conditions) if score_conditions else 0
-                    query = query.order_by(total_score.desc(), models.Party.created_at.desc())
-                    
-            if search_conditions:
-                query = query.where(or_(*search_conditions))
-            
-            # Location radius filtering
-        if filters.location_radius:
-            lat = filters.location_radius.get("lat")
-            lng = filters.location_radius.get("lng")
-            radius_km = filters.location_radius.get("radius_km", 10)
-            
-            if lat is not None and lng is not None:
-                # Simple distance calculation (you might want to use PostGIS for better performance)
-                # This is a rough approximation - for production, use proper spatial queries
-                query = query.where(
-                    and_(
-                        models.Party.latitude.is_not(None),
-                        models.Party.longitude.is_not(None)
-                    )
-                )
-        
-        # Date range filtering
-        if filters.date_range:
-            if filters.date_range.get("start"):
-                start_date = datetime.fromisoformat(filters.date_range["start"].replace('Z', '+00:00'))
-                query = query.where(models.Party.start_time <= start_date)
-            if filters.date_range.get("end"):
-                end_date = datetime.fromisoformat(filters.date_range["end"].replace('Z', '+00:00'))
-                query = query.where(models.Party.end_time >= end_date)
-            if filters.sort_by == "time":
-                query = query.order_by(models.Party.end_time.desc())
-        
-        # Host filtering
-        if filters.host_id:
-            query = query.where(models.Party.host_id == filters.host_id)
-        
-        # Max attendees filtering
-        if filters.ticketsLeft:
-            query = query.where(models.Party.max_attendees <= filters.ticketsLeft)
-        distances = {}
-        parties = sesh.exec(query).all()
-        # Post-process location filtering (since SQLite doesn't have spatial functions)
-        if filters.location_radius:
-            lat = filters.location_radius.get("lat")
-            lng = filters.location_radius.get("lng")
-            radius_km = filters.location_radius.get("radius_km", 10)
-            
-            if lat is not None and lng is not None:
-                import math
-                
-                def calculate_distance(lat1, lng1, lat2, lng2):
-                    """Calculate distance between two points in km"""
-                    R = 6371  # Earth's radius in km
-                    lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
-                    dlat = lat2 - lat1
-                    dlng = lng2 - lng1
-                    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng/2)**2
-                    c = 2 * math.asin(math.sqrt(a))
-                    return R * c
-                
-                # Filter parties within radius
-                # parties = [
-                #     party for party in parties 
-                #     if party.latitude and party.longitude and 
-                #     calculate_distance(lat, lng, party.latitude, party.longitude) <= radius_km
-                # ]
-                closeparties = []
-                for party in parties:
-                    if party.latitude and party.longitude:
-                        distance = calculate_distance(lat, lng, party.latitude, party.longitude)
-                        if distance <= radius_km:
-                            closeparties.append(party)
-                            distances[party.id] = distance
-                parties = closeparties
-                if getattr(filters, "sort_by", None) == "distance":
-                    parties.sort(key=lambda p: distances.get(p.id, float("inf")))
-        # Build response
-        party_list = []
+    # Feed clients repeat the same few filters, serve those from the result cache
+    filters = filter_cache.normalize(filters)
+    cache_key = filter_cache.cache_key(filters)
+    cached = filter_cache.get(cache_key) if not filters.stream else None
+    if cached is not None:
+        return cached
+    # Taken before anything is read, a write committed from here on keeps this result out of the cache
+    generation = filter_cache.generation()
+    
+    limit = clamp_limit(filters.limit)
+    fields = parse_fields(filters.fields, FILTER_FIELDS, LIST_SUPPORTED)
+    
+    center = None
+    if filters.location_radius:
+        lat = filters.location_radius.get("lat")
+        lng = filters.location_radius.get("lng")
+        radius_km = filters.location_radius.get("radius_km", 10)
+        if lat is not None and lng is not None:
+            center = (lat, lng, radius_km)
+    
+    # Pick the keyset the page is ordered by
+    sort = "created_at"
+    if filters.sort_by == "phrase" and filters.hashtags:
+        sort = "phrase"
+    elif filters.sort_by == "time" and filters.date_range:
+        sort = "time"
+    elif filters.sort_by == "distance" and center:
+        sort = "distance"
+    elif filters.sort_by == "popular":
+        sort = "popular"
+    
+    start_date = end_date = None
+    if filters.date_range:
+        if filters.date_range.get("start"):
+            start_date = datetime.fromisoformat(filters.date_range["start"].replace('Z', '+00:00'))
+        if filters.date_range.get("end"):
+            end_date = datetime.fromisoformat(filters.date_range["end"].replace('Z', '+00:00'))
+    cursor = decode_cursor(filters.cursor, sort) if filters.cursor else None
+    if filters.stream and sort == "distance":
+        raise HTTPException(status_code=400, detail="Distance sorted results cannot be streamed")
+    
+    # Active parties without full text search can come from the in-memory snapshot
+    if filters.active_only and not filters.hashtags and not filters.stream and party_snapshot.enabled():
+        parties, page_key, distances = _snapshot_page(
+            sesh, fields, sort, limit, cursor, center, filters, start_date, end_date
+        )
+        return _filter_response(sesh, cache_key, generation, filters, sort, fields, limit, parties, page_key, distances, center)
+    
+    extra_columns = ["created_at", "end_time"]
+    if center:
+        extra_columns += ["latitude", "longitude"]
+    query = select(*party_columns(fields, *extra_columns)).where(lifecycle.ACTIVE)
+    sort_key = {
+        "created_at": models.Party.created_at,
+        "time": models.Party.end_time,
+        "popular": models.Party.attendee_count,
+    }.get(sort)
+    if sort == "popular":
+        query = query.add_columns(models.Party.attendee_count.label("popularity"))
+    
+    # Hashtag filtering, served by the FTS5 index with BM25 ranking
+    # (name 3, hashtags 2, description 1)
+    match = search.match_expression(filters.hashtags) if filters.hashtags else None
+    if match:
+        query = query.join(search.party_fts, search.party_fts.c.rowid == models.Party.id).where(
+            search.matches(match)
+        )
+        if sort == "phrase":
+            sort_key = search.rank()
+            query = query.add_columns(sort_key.label("score"))
+    elif sort == "phrase":
+        sort = "created_at"
+        sort_key = models.Party.created_at
+    
+    # Location radius filtering, the R*Tree prunes to a bounding box and
+    # the exact distance check runs after the query
+    if center:
+        query = query.where(models.Party.id.in_(parties_near(*center)))
+    
+    # Date range filtering
+    if start_date:
+        query = query.where(models.Party.start_time <= start_date)
+    if end_date:
+        query = query.where(models.Party.end_time >= end_date)
+    if filters.active_only:
+        now = datetime.now(dt.UTC).replace(tzinfo=None)
+        query = query.where(or_(models.Party.end_time.is_(None), models.Party.end_time >= now))
+    
+    # Host filtering
+    if filters.host_id:
+        query = query.where(models.Party.host_id == filters.host_id)
+    
+    # Open spots filtering, parties without a cap always have tickets left
+    if filters.ticketsLeft:
+        query = query.where(or_(
+            models.Party.max_attendees.is_(None),
+            models.Party.max_attendees - models.Party.attendee_count >= filters.ticketsLeft
+        ))
+    
+    # Keyset ordering and cursor, distance is ordered in Python below
+    if sort_key is not None:
+        query = query.order_by(sort_key.desc(), models.Party.id.desc())
+        if cursor:
+            query = query.where(after_cursor_desc(sort_key, models.Party.id, *cursor))
+    if filters.stream:
+        return stream_parties(query, fields, filters.stream, center, utc_suffix=True)
+    if sort_key is not None and not center:
+        query = query.limit(limit + 1)
+    
+    parties = sesh.exec(query).all()
+    distances = {}
+    # Exact radius check on the bounding box candidates
+    if center:
+        lat, lng, radius_km = center
+        closeparties = []
         for party in parties:
-            # Get host info
-            party_data = {
-                "id": party.id,
-                "name": party.name,
-                "description": party.description,
-                "hashtags": party.hashtags,
-                "distance" : distances.get(party.id, 0),
-                "attendee_count": len(get_attendee_ids(party)),
-                # "location": {
-                #     "latitude": party.latitude,
-                #     "longitude": party.longitude,
-                #     "address": party.address
-                # },
-                "start_time": party.start_time.isoformat() + "Z",
-                "end_time": party.end_time.isoformat() + "Z",
-                "max_attendees": party.max_attendees,
-            }
-            party_list.append(party_data)
-        
-        return {"parties": party_list}
+            distance = calculate_distance(lat, lng, party.latitude, party.longitude)
+            if distance <= radius_km:
+                closeparties.append(party)
+                distances[party.id] = distance
+        parties = closeparties
+        if sort == "distance":
+            parties.sort(key=lambda p: (distances[p.id], p.id))
+            if cursor:
+                parties = [p for p in parties if (distances[p.id], p.id) > cursor]
+        parties = parties[:limit + 1]
+    
+    page_key = {
+        "created_at": lambda row: row.created_at,
+        "time": lambda row: row.end_time,
+        "phrase": lambda row: row.score,
+        "popular": lambda row: row.popularity,
+        "distance": lambda row: distances[row.id],
+    }[sort]
+    return _filter_response(sesh, cache_key, generation, filters, sort, fields, limit, parties, page_key, distances, center)
+
+def _snapshot_page(sesh, fields, sort, limit, cursor, center, filters, start_date, end_date):
+    """Pick the page from the party snapshot, SQL only loads the columns of its rows"""
+    page, distances = party_snapshot.snapshot.query(
+        sort, limit, cursor, center, start_date, end_date, filters.host_id, filters.ticketsLeft
+    )
+    keys = dict(page)
+    rows = sesh.execute(select(*party_columns(fields)).where(models.Party.id.in_(list(keys)))).all() if keys else []
+    rows = {row.id: row for row in rows}
+    parties = [rows[party_id] for party_id in keys if party_id in rows]
+    return parties, lambda row: keys[row.id], distances
+
+def _filter_response(sesh, cache_key, generation, filters, sort, fields, limit, parties, page_key, distances, center):
+    """Trim the limit + 1 rows to a page, serialize it and cache the response"""
+    parties, next_cursor = take_page(parties, limit, sort, page_key)
+    hosts = get_users_by_ids(sesh, [party.host_id for party in parties]) if "host" in fields else {}
+    
+    # Build response
+    party_list = [
+        serialize_party(party, fields, hosts, distances=distances, utc_suffix=True)
+        for party in parties
+    ]
+    
+    response = {"parties": party_list, "next_cursor": next_cursor}
+    filter_cache.store(
+        cache_key, response, [party.id for party in parties], generation, center,
+        by_attendance=sort == "popular" or bool(filters.ticketsLeft)
+    )
+    return response
 
 @app.post("/parties/{party_id}/end")
-async def end_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token)):
+@concurrency.retry_on_conflict
+def end_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
     """End a party abruptly by setting end_time to now"""
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get the party
-        party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
-        if not party:
-            raise HTTPException(status_code=404, detail="Party not found")
-        
-        # Check if user is the host
-        if party.host_id != user.id:
-            raise HTTPException(status_code=403, detail="Only the host can end the party")
-        
-        # End the party by setting end_time to now
-        party.end_time = datetime.now(datetime.UTC)
-        sesh.commit()
-        
-        return {"message": "Party ended successfully"}
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Get the party
+    party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
+    if not party:
+        raise HTTPException(status_code=404, detail="Party not found")
+    
+    # Check if user is the host
+    if party.host_id != user.id:
+        raise HTTPException(status_code=403, detail="Only the host can end the party")
+    
+    # End the party by setting end_time to now
+    party.end_time = datetime.now(dt.UTC)
+    party.updated_at = party.end_time
+    sesh.commit()
+    filter_cache.invalidate_party(party_id)
+    party_snapshot.upsert(party)
+    pubsub.broker.publish(party_id, {"type": "ended", "party_id": party_id})
+    
+    return {"message": "Party ended successfully"}
 
 @app.post("/parties/{party_id}/cancel")
-async def cancel_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token)):
+@concurrency.retry_on_conflict
+def cancel_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
     """Cancel a party by setting start_time equal to end_time"""
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get the party
-        party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
-        if not party:
-            raise HTTPException(status_code=404, detail="Party not found")
-        
-        # Check if user is the host
-        if party.host_id != user.id:
-            raise HTTPException(status_code=403, detail="Only the host can cancel the party")
-        
-        # Cancel the party by setting start_time equal to end_time
-        party.end_time = party.start_time
-        sesh.commit()
-        
-        return {"message": "Party cancelled successfully"}
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Get the party
+    party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
+    if not party:
+        raise HTTPException(status_code=404, detail="Party not found")
+    
+    # Check if user is the host
+    if party.host_id != user.id:
+        raise HTTPException(status_code=403, detail="Only the host can cancel the party")
+    
+    # Cancel the party by setting start_time equal to end_time
+    party.end_time = party.start_time
+    party.updated_at = datetime.now(dt.UTC)
+    sesh.commit()
+    filter_cache.invalidate_party(party_id)
+    party_snapshot.upsert(party)
+    pubsub.broker.publish(party_id, {"type": "cancelled", "party_id": party_id})
+    
+    return {"message": "Party cancelled successfully"}
 
 # Saved parties endpoints
+class SavedPartiesBatchRequest(BaseModel):
+    save: List[int] = []
+    unsave: List[int] = []
+
+@app.post("/users/saved-parties/batch")
+@concurrency.retry_on_conflict
+def batch_saved_parties(
+    changes: SavedPartiesBatchRequest,
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
+):
+    """Save and unsave many parties in one transaction, one result per requested id"""
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if len(changes.save) + len(changes.unsave) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids per batch")
+    
+    existing = set(sesh.exec(
+        select(models.Party.id).where(models.Party.id.in_(set(changes.save)))
+    ).all()) if changes.save else set()
+    
+    # Same outcomes and messages as the single item routes
+    results = []
+    for party_id in changes.save:
+        if party_id not in existing:
+            results.append({"id": party_id, "action": "save", "status": 404, "detail": "Party not found"})
+        elif add_saved_party(user, party_id):
+            results.append({"id": party_id, "action": "save", "status": 200, "detail": "Party saved successfully"})
+        else:
+            results.append({"id": party_id, "action": "save", "status": 400, "detail": "Party already saved"})
+    for party_id in changes.unsave:
+        if remove_saved_party(user, party_id):
+            results.append({"id": party_id, "action": "unsave", "status": 200, "detail": "Party removed from saved parties"})
+        else:
+            results.append({"id": party_id, "action": "unsave", "status": 400, "detail": "Party not in saved parties"})
+    
+    if any(result["status"] == 200 for result in results):
+        sesh.commit()
+        IDVerification.invalidate_user(token_data['user_id'])
+    return {"results": results}
+
 @app.post("/users/saved-parties/{party_id}")
-async def save_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token)):
+@concurrency.retry_on_conflict
+def save_party(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
     """Save a party to user's saved parties"""
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get the party
-        party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
-        if not party:
-            raise HTTPException(status_code=404, detail="Party not found")
-        
-        # Add party to saved parties
-        if add_saved_party(user, party_id):
-            sesh.commit()
-            return {"message": "Party saved successfully"}
-        else:
-            raise HTTPException(status_code=400, detail="Party already saved")
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Get the party
+    party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
+    if not party:
+        raise HTTPException(status_code=404, detail="Party not found")
+    
+    # Add party to saved parties
+    if add_saved_party(user, party_id):
+        sesh.commit()
+        IDVerification.invalidate_user(token_data['user_id'])
+        return {"message": "Party saved successfully"}
+    else:
+        raise HTTPException(status_code=400, detail="Party already saved")
 
 @app.delete("/users/saved-parties/{party_id}")
-async def remove_saved_party_endpoint(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token)):
+@concurrency.retry_on_conflict
+def remove_saved_party_endpoint(party_id: int, token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
     """Remove a party from user's saved parties"""
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Remove party from saved parties
-        if remove_saved_party(user, party_id):
-            sesh.commit()
-            return {"message": "Party removed from saved parties"}
-        else:
-            raise HTTPException(status_code=400, detail="Party not in saved parties")
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Remove party from saved parties
+    if remove_saved_party(user, party_id):
+        sesh.commit()
+        IDVerification.invalidate_user(token_data['user_id'])
+        return {"message": "Party removed from saved parties"}
+    else:
+        raise HTTPException(status_code=400, detail="Party not in saved parties")
 
 @app.get("/users/saved-parties")
-async def get_saved_parties(token_data: dict = Depends(IDVerification.verify_firebase_token)):
+def get_saved_parties(
+    response: Response,
+    if_none_match: str | None = Header(None),
+    token_data: dict = Depends(IDVerification.verify_firebase_token),
+    sesh: Session = Depends(get_session)
+):
     """Get user's saved parties"""
-    with get_db_session() as sesh:
-        # Get the current user
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get saved party IDs
-        saved_party_ids = get_saved_party_ids(user)
-        
-        # Get party details
-        saved_parties = []
-        for party_id in saved_party_ids:
-            party = sesh.exec(select(models.Party).where(models.Party.id == party_id)).first()
-            if party:
-                # Get host info
-                host = sesh.exec(select(models.User).where(models.User.id == party.host_id)).first()
-                
-                party_data = {
-                    "id": party.id,
-                    "name": party.name,
-                    "description": party.description,
-                    "host": {
-                        "id": host.id,
-                        "username": host.username
-                    } if host else None,
-                    "attendee_count": len(get_attendee_ids(party)),
-                    "location": {
-                        "latitude": party.latitude,
-                        "longitude": party.longitude,
-                        "address": party.address
-                    },
-                    "start_time": party.start_time,
-                    "end_time": party.end_time,
-                    "max_attendees": party.max_attendees,
-                    "created_at": party.created_at
-                }
-                saved_parties.append(party_data)
-        
-        return {"saved_parties": saved_parties}
+    # Get the current user
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Get saved party IDs
+    saved_party_ids = get_saved_party_ids(user)
+    parties = get_parties_by_ids(sesh, saved_party_ids, party_columns(LIST_FIELDS, *etags.VERSION_FIELDS))
+    # Rows come back in saved order, so the version also covers saving, unsaving and reordering
+    etag = etags.make_etag(etags.party_versions(parties))
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    hosts = get_users_by_ids(sesh, [party.host_id for party in parties])
+    
+    saved_parties = [
+        serialize_party(party, LIST_FIELDS, hosts) for party in parties
+    ]
+    
+    etags.tag(response, etag)
+    return {"saved_parties": saved_parties}
     
 @app.post("/users/become-host")
-async def become_host(token_data: dict = Depends(IDVerification.verify_firebase_token)):
+@concurrency.retry_on_conflict
+def become_host(token_data: dict = Depends(IDVerification.verify_firebase_token), sesh: Session = Depends(get_session)):
     """
     Instantly upgrades the current user to a host (for development/testing only).
     TODO: In production, require Stripe onboarding and card verification here!
     """
-    with get_db_session() as sesh:
-        user = await IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        if user.isHost:
-            return {"message": "User is already a host"}
-        user.isHost = True
-        # Create Host record if not exists
-        existing_host = sesh.exec(select(Host).where(Host.user_id == user.id)).first()
-        if not existing_host:
-            new_host = Host(user_id=user.id)
-            sesh.add(new_host)
-        sesh.commit()
-        return {"message": "User upgraded to host (dev only, add Stripe in prod)", "user_id": user.id}
+    user = IDVerification.get_user_by_firebase_uid(sesh, token_data['user_id'])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if user.isHost:
+        return {"message": "User is already a host"}
+    user.isHost = True
+    user.updated_at = datetime.now(dt.UTC)
+    # Create Host record if not exists
+    existing_host = sesh.exec(select(Host).where(Host.user_id == user.id)).first()
+    if not existing_host:
+        new_host = Host(user_id=user.id)
+        sesh.add(new_host)
+    sesh.commit()
+    IDVerification.invalidate_user(token_data['user_id'])
+    return {"message": "User upgraded to host (dev only, add Stripe in prod)", "user_id": user.id}
     
+
+startup.state.imported(time.perf_counter() - _import_started)
@@ -0,0 +1,178 @@
+"""Request and database instrumentation, exposed in Prometheus text format.
+
+MetricsMiddleware times every HTTP request per route template and status,
+and the engine hooks charge each SQL statement (count and time) to the
+request that ran it, so per-request query counts show N+1 patterns.
+Everything is kept in plain counters under one lock, with no per-request
+allocation beyond a two-item list.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+STATEMENT_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# [statements, seconds] of the current request, sync routes run in a copy
+# of the request context so they add to the same list
+_request_db = contextvars.ContextVar("request_db", default=None)
+# ASGI scope of the current request, the router adds the matched route to it
+_request_scope = contextvars.ContextVar("request_scope", default=None)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (method, route, status) -> count
+        self.in_flight = defaultdict(int)  # method -> gauge, the route is not known before routing
+        self.latency: Dict[Tuple[str, str], Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.request_statements: Dict[Tuple[str, str], Histogram] = defaultdict(lambda: Histogram(STATEMENT_BUCKETS))
+        self.request_db_seconds: Dict[Tuple[str, str], Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.statement_seconds = Histogram(STATEMENT_TIME_BUCKETS)
+        # Extra gauges/counters pulled at scrape time: name -> (type, help, callback)
+        self.collectors: Dict[str, Tuple[str, str, Callable[[], Iterable[Tuple[dict, float]]]]] = {}
+
+    def started(self, method: str) -> None:
+        with self._lock:
+            self.in_flight[method] += 1
+
+    def finished(self, key, status: int, seconds: float, statements: int, db_seconds: float) -> None:
+        with self._lock:
+            self.in_flight[key[0]] -= 1
+            self.requests[(*key, status)] += 1
+            self.latency[key].observe(seconds)
+            self.request_statements[key].observe(statements)
+            self.request_db_seconds[key].observe(db_seconds)
+
+    def statement(self, seconds: float) -> None:
+        with self._lock:
+            self.statement_seconds.observe(seconds)
+
+    def collector(self, name: str, kind: str, help: str, callback) -> None:
+        """Register a metric whose samples are read when /metrics is scraped"""
+        self.collectors[name] = (kind, help, callback)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            _header(lines, "http_requests_total", "counter", "HTTP requests by route and status")
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+            _header(lines, "http_requests_in_flight", "gauge", "HTTP requests being served")
+            for method, count in sorted(self.in_flight.items()):
+                lines.append(f"http_requests_in_flight{_labels(method=method)} {count}")
+            _histograms(lines, "http_request_duration_seconds", "HTTP request latency", self.latency)
+            _histograms(lines, "db_statements_per_request", "SQL statements run by one request", self.request_statements)
+            _histograms(lines, "db_seconds_per_request", "Time spent in SQL by one request", self.request_db_seconds)
+            _header(lines, "db_statement_duration_seconds", "histogram", "SQL statement latency")
+            _histogram_samples(lines, "db_statement_duration_seconds", {}, self.statement_seconds)
+        for name, (kind, help, callback) in self.collectors.items():
+            _header(lines, name, kind, help)
+            for labels, value in callback():
+                lines.append(f"{name}{_labels(**labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def _header(lines, name: str, kind: str, help: str) -> None:
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def _histograms(lines, name: str, help: str, histograms) -> None:
+    _header(lines, name, "histogram", help)
+    for (method, route), histogram in sorted(histograms.items()):
+        _histogram_samples(lines, name, {"method": method, "route": route}, histogram)
+
+def _histogram_samples(lines, name: str, labels: dict, histogram: Histogram) -> None:
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    cumulative += histogram.counts[-1]
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {cumulative}")
+
+registry = Registry()
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, streamed bodies are timed until their last chunk"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        scope_token = _request_scope.set(scope)
+        registry.started(scope["method"])
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            _request_scope.reset(scope_token)
+            # The router stores the matched route in the scope, label by its
+            # template so /parties/1 and /parties/2 share a series
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "unmatched")
+            registry.finished(key, status, elapsed, db[0], db[1])
+
+def current_route() -> str | None:
+    """Route template of the request being served, None outside of requests"""
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+def instrument_engine(engine) -> None:
+    """Time every statement and charge it to the current request"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        registry.statement(elapsed)
+        db = _request_db.get()
+        if db is not None:
+            db[0] += 1
+            db[1] += elapsed
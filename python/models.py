@@ -1,8 +1,11 @@
-from sqlmodel import Field, SQLModel, create_engine
+from sqlmodel import Field, SQLModel, Session, create_engine, select, delete, update
+from sqlalchemy import Index
+from sqlalchemy.orm import declared_attr
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pydantic import EmailStr, BaseModel
 from datetime import datetime
 import datetime as dt
-from typing import List, Optional
+from typing import Dict, List, Optional
 import json
 
 class User(SQLModel, table=True):
@@ -16,11 +19,27 @@ class User(SQLModel, table=True):
     isHost: bool | None = Field(default=False)
     bio: str | None = Field(default=None, description="User's bio")
     saved_party_ids: str = Field(default="[]", description="JSON array of saved party IDs")
-    current_party_id: int | None = Field(default=None, description="ID of party user is currently at")
+    current_party_id: int | None = Field(default=None, index=True, description="ID of party user is currently at")
     created_at: datetime | None = Field(default_factory=lambda: datetime.now(dt.UTC))
     updated_at: datetime | None = Field(default_factory=lambda: datetime.now(dt.UTC))
+    # Bumped by every ORM flush, which only succeeds if the row still has the version it was read at
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"}, description="Row version")
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version}
 
 class Party(SQLModel, table=True):
+    __table_args__ = (
+        # host_id filter, newest first
+        Index("ix_party_host_id_created_at", "host_id", "created_at"),
+        # "live now" (end_time >= t AND start_time <= t) answered from the index alone,
+        # end_time leads so the same index serves the end_time sort
+        Index("ix_party_end_time_start_time", "end_time", "start_time"),
+        # The lifecycle sweep's "still active but past end_time" scan
+        Index("ix_party_is_active_end_time", "is_active", "end_time"),
+    )
+    
     id: int | None = Field(default=None, primary_key=True)
     name: str = Field(description="Party name")
     description: str | None = Field(default=None, description="Party description")
@@ -28,9 +47,6 @@ class Party(SQLModel, table=True):
     # Host relationship
     host_id: int = Field(foreign_key="user.id", description="Host user ID")
     
-    # Attendees as JSON list of user IDs (lighter than full User objects)
-    attendee_ids: str = Field(default="[]", description="JSON array of user IDs")
-    
     # Location with PostGIS support
     latitude: float | None = Field(default=None, description="Latitude")
     longitude: float | None = Field(default=None, description="Longitude")
@@ -40,12 +56,63 @@ class Party(SQLModel, table=True):
     start_time: datetime | None = Field(default=None, description="Party start time")
     end_time: datetime | None = Field(default=None, description="Party end time")
     max_attendees: int | None = Field(default=None, description="Maximum number of attendees")
+    # Cleared by the lifecycle sweep once end_time has passed, see lifecycle.py
+    is_active: bool = Field(default=True, sa_column_kwargs={"server_default": "1"}, description="Not yet ended")
+    # Denormalized len(attendance rows), kept in step by add_attendee/remove_attendee
+    attendee_count: int = Field(default=0, index=True, sa_column_kwargs={"server_default": "0"}, description="Number of attendees")
     hashtags: str | None = Field(default=None, description="hashtags")
     media_url: str | None = Field(default=None, description="URL for party media/images")
     
-    # Timestamps
-    created_at: datetime | None = Field(default_factory=lambda: datetime.now(dt.UTC))
+    # Timestamps (created_at is indexed for keyset pagination; the rowid id rides along in the index)
+    created_at: datetime | None = Field(default_factory=lambda: datetime.now(dt.UTC), index=True)
     updated_at: datetime | None = Field(default_factory=lambda: datetime.now(dt.UTC))
+    # Same compare-and-swap as User.version, the bulk UPDATEs below bump it themselves
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"}, description="Row version")
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version}
+
+class Attendance(SQLModel, table=True):
+    # (party_id, user_id) primary key doubles as the party -> attendees index
+    party_id: int = Field(foreign_key="party.id", primary_key=True, description="Party ID")
+    user_id: int = Field(foreign_key="user.id", primary_key=True, index=True, description="Attendee user ID")
+    joined_at: datetime | None = Field(default_factory=lambda: datetime.now(dt.UTC))
+
+# Cold storage for parties that ended a while ago, moved out of party by archive.py so
+# the live tables and their indexes only hold current parties. Same column names as
+# Party (minus is_active and version), rows keep their original ids.
+class ArchivedParty(SQLModel, table=True):
+    __tablename__ = "party_archive"
+    __table_args__ = (
+        # History newest first, overall and per host
+        Index("ix_party_archive_end_time", "end_time"),
+        Index("ix_party_archive_host_id_end_time", "host_id", "end_time"),
+    )
+
+    id: int = Field(primary_key=True)
+    name: str
+    description: str | None = None
+    host_id: int
+    latitude: float | None = None
+    longitude: float | None = None
+    address: str | None = None
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+    max_attendees: int | None = None
+    attendee_count: int = 0
+    hashtags: str | None = None
+    media_url: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+    archived_at: datetime | None = None
+
+class ArchivedAttendance(SQLModel, table=True):
+    __tablename__ = "attendance_archive"
+
+    party_id: int = Field(primary_key=True)
+    user_id: int = Field(primary_key=True, index=True)
+    joined_at: datetime | None = None
 
 class newUser(BaseModel):
     email: EmailStr
@@ -53,35 +120,89 @@ class newUser(BaseModel):
     phone: str = None
     bio: str = None
 
-# Helper functions for Party model
-def get_attendee_ids(party: Party) -> List[int]:
-    """Get list of attendee user IDs from JSON string"""
-    try:
-        return json.loads(party.attendee_ids)
-    except (json.JSONDecodeError, TypeError):
-        return []
+# Helper functions for Party attendance
+def get_attendees_by_party(db: Session, party_ids: List[int]) -> Dict[int, List[User]]:
+    """Attendee users of many parties in one joined query, keyed by party id in join order"""
+    if not party_ids:
+        return {}
+    statement = (
+        select(Attendance.party_id, User)
+        .join(Attendance, Attendance.user_id == User.id)
+        .where(Attendance.party_id.in_(set(party_ids)))
+        .order_by(Attendance.joined_at)
+    )
+    attendees: Dict[int, List[User]] = {}
+    for party_id, user in db.exec(statement).all():
+        attendees.setdefault(party_id, []).append(user)
+    return attendees
 
-def set_attendee_ids(party: Party, attendee_ids: List[int]) -> None:
-    """Set attendee user IDs as JSON string"""
-    party.attendee_ids = json.dumps(attendee_ids)
+def add_attendee(db: Session, party_id: int, user_id: int) -> int | None:
+    """Add a user to the party attendees, returns the party's new attendee_count.
 
-def add_attendee(party: Party, user_id: int) -> bool:
-    """Add a user to the party attendees"""
-    attendee_ids = get_attendee_ids(party)
-    if user_id not in attendee_ids:
-        attendee_ids.append(user_id)
-        set_attendee_ids(party, attendee_ids)
-        return True
-    return False
+    Returns None if already attending or if the party is no longer active, in
+    which case the caller must roll back rather than commit.
+    """
+    statement = (
+        sqlite_insert(Attendance)
+        .values(party_id=party_id, user_id=user_id, joined_at=datetime.now(dt.UTC))
+        .on_conflict_do_nothing()
+    )
+    if db.exec(statement).rowcount != 1:
+        return None
+    # is_active is checked in the same write transaction, so a join racing the
+    # lifecycle sweep either lands before it (and is cleared by it) or fails
+    statement = update(Party).where(Party.id == party_id, Party.is_active).values(
+        attendee_count=Party.attendee_count + 1, updated_at=datetime.now(dt.UTC), version=Party.version + 1
+    ).returning(Party.attendee_count)
+    return db.exec(statement).scalar_one_or_none()
 
-def remove_attendee(party: Party, user_id: int) -> bool:
-    """Remove a user from the party attendees"""
-    attendee_ids = get_attendee_ids(party)
-    if user_id in attendee_ids:
-        attendee_ids.remove(user_id)
-        set_attendee_ids(party, attendee_ids)
-        return True
-    return False
+def remove_attendee(db: Session, party_id: int, user_id: int) -> int | None:
+    """Remove a user from the party attendees, returns the party's new attendee_count or None if not attending"""
+    statement = delete(Attendance).where(
+        Attendance.party_id == party_id, Attendance.user_id == user_id
+    )
+    if db.exec(statement).rowcount != 1:
+        return None
+    return db.exec(update(Party).where(Party.id == party_id).values(
+        attendee_count=Party.attendee_count - 1, updated_at=datetime.now(dt.UTC), version=Party.version + 1
+    ).returning(Party.attendee_count)).scalar_one()
+
+def get_archived_attendees_by_party(db: Session, party_ids: List[int]) -> Dict[int, List[User]]:
+    """get_attendees_by_party for archived parties"""
+    if not party_ids:
+        return {}
+    statement = (
+        select(ArchivedAttendance.party_id, User)
+        .join(ArchivedAttendance, ArchivedAttendance.user_id == User.id)
+        .where(ArchivedAttendance.party_id.in_(set(party_ids)))
+        .order_by(ArchivedAttendance.joined_at)
+    )
+    attendees: Dict[int, List[User]] = {}
+    for party_id, user in db.exec(statement).all():
+        attendees.setdefault(party_id, []).append(user)
+    return attendees
+
+def get_users_by_ids(db: Session, user_ids: List[int]) -> Dict[int, User]:
+    """Load many users with one IN (...) query, keyed by id"""
+    if not user_ids:
+        return {}
+    statement = select(User).where(User.id.in_(set(user_ids)))
+    return {user.id: user for user in db.exec(statement).all()}
+
+def get_parties_by_ids(db: Session, party_ids: List[int], columns: list | None = None) -> List[Party]:
+    """Load many parties with one IN (...) query, keeping the order of party_ids.
+
+    With columns (which must include Party.id) projected rows are returned instead of Party objects.
+    """
+    if not party_ids:
+        return []
+    if columns:
+        # execute() keeps a Row even when the projection is Party.id alone, exec() would unwrap it
+        rows = db.execute(select(*columns).where(Party.id.in_(set(party_ids)))).all()
+    else:
+        rows = db.exec(select(Party).where(Party.id.in_(set(party_ids)))).all()
+    parties = {party.id: party for party in rows}
+    return [parties[party_id] for party_id in party_ids if party_id in parties]
 
 # Helper functions for User saved parties
 def get_saved_party_ids(user: User) -> List[int]:
@@ -94,6 +215,7 @@ def get_saved_party_ids(user: User) -> List[int]:
 def set_saved_party_ids(user: User, party_ids: List[int]) -> None:
     """Set saved party IDs as JSON string"""
     user.saved_party_ids = json.dumps(party_ids)
+    user.updated_at = datetime.now(dt.UTC)
 
 def add_saved_party(user: User, party_id: int) -> bool:
     """Add a party to user's saved parties"""
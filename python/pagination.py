@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlmodel import or_, and_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def clamp_limit(limit: int | None) -> int:
+    """Keep page sizes between 1 and MAX_PAGE_SIZE"""
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(sort: str, key, party_id: int) -> str:
+    """Encode the last row of a page as an opaque cursor string"""
+    if isinstance(key, datetime):
+        key = {"dt": key.isoformat()}
+    payload = json.dumps({"s": sort, "k": key, "id": party_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str):
+    """Decode a cursor produced by encode_cursor, returns (key, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = payload["k"]
+        if isinstance(key, dict):
+            key = datetime.fromisoformat(key["dt"])
+        party_id = int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return key, party_id
+
+def after_cursor_desc(key_column, id_column, key, party_id):
+    """WHERE clause for the rows after (key, id) when ordering by key DESC, id DESC.
+
+    SQLite sorts NULLs last in descending order, so a NULL key is only followed
+    by other NULL keys with a smaller id.
+    """
+    if key is None:
+        return and_(key_column.is_(None), id_column < party_id)
+    return or_(
+        key_column < key,
+        and_(key_column == key, id_column < party_id),
+        key_column.is_(None),
+    )
+
+def take_page(rows: list, limit: int, sort: str, key_of):
+    """Trim a limit + 1 row fetch to one page, returns (rows, next_cursor)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, key_of(last), last.id)
@@ -0,0 +1,305 @@
+"""Optional in-memory columnar index of active and upcoming parties.
+
+With PARTY_SNAPSHOT=1 (and NumPy installed) every party that has not ended is
+kept in contiguous arrays: id, host, lat/lng, start/end/created epoch
+microseconds, capacity and attendee count. `active_only` filter requests
+without hashtags are then answered with vectorized masks and an argpartition
+top-k, and SQL is only used to load the columns of the final page.
+
+The snapshot is loaded in the background at startup and patched by the
+create/end/cancel/join/leave routes of this process, so it only suits a single worker process that is
+the only writer of the database.
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import datetime as dt
+from typing import Dict, List, Tuple
+
+from sqlmodel import Session, select, or_
+
+import models
+from spatial import EARTH_RADIUS_KM
+
+PARTY_SNAPSHOT = os.getenv("PARTY_SNAPSHOT", "0").lower() in ("1", "true", "yes")
+
+np = None
+if PARTY_SNAPSHOT:
+    # Only paid for at import when the snapshot is on
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+# Ended parties are masked out at query time and dropped this often
+PARTY_SNAPSHOT_PRUNE_INTERVAL = int(os.getenv("PARTY_SNAPSHOT_PRUNE_INTERVAL", "60"))
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# NULL timestamps, picked so range filters never match them (like SQL) and a
+# NULL end_time sorts last in descending order (like SQLite)
+_LOW = -(2 ** 63)
+_HIGH = 2 ** 63 - 1
+
+COLUMNS = {
+    "id": "int64",
+    "host_id": "int64",
+    "latitude": "float64",
+    "longitude": "float64",
+    "start": "int64",     # start_time, _HIGH when NULL
+    "end": "int64",       # end_time, _LOW when NULL
+    "created": "int64",   # created_at, _LOW when NULL
+    "capacity": "int64",  # max_attendees, -1 when uncapped
+    "count": "int64",     # attendee_count
+}
+
+# Sort name -> (column, descending), distance is computed per query
+SORT_COLUMNS = {"created_at": ("created", True), "time": ("end", True), "popular": ("count", True)}
+
+def _micros(value: datetime | None) -> int | None:
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(dt.UTC).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+def _datetime(micros: int) -> datetime | None:
+    return None if micros == _LOW else _EPOCH + timedelta(microseconds=int(micros))
+
+def _now() -> datetime:
+    # Timestamps are stored as naive UTC
+    return datetime.now(dt.UTC).replace(tzinfo=None)
+
+def _row(party) -> tuple:
+    start, end, created = _micros(party.start_time), _micros(party.end_time), _micros(party.created_at)
+    return (
+        party.id,
+        party.host_id,
+        math.nan if party.latitude is None else party.latitude,
+        math.nan if party.longitude is None else party.longitude,
+        _HIGH if start is None else start,
+        _LOW if end is None else end,
+        _LOW if created is None else created,
+        -1 if party.max_attendees is None else party.max_attendees,
+        party.attendee_count or 0,
+    )
+
+def _haversine(lat: float, lng: float, lats, lngs):
+    """Vectorized spatial.calculate_distance, NaN for parties without coordinates"""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(a))
+
+def _top_k(keys, ids, k: int, descending: bool):
+    """Positions of the first k rows ordered by (key, id), both descending or both ascending"""
+    if len(keys) > k:
+        # argpartition finds the k-th key, rows tied with it are all kept so
+        # the id tie-break below stays exact
+        if descending:
+            kth = keys[np.argpartition(keys, len(keys) - k)[len(keys) - k]]
+            candidates = np.flatnonzero(keys >= kth)
+        else:
+            kth = keys[np.argpartition(keys, k - 1)[k - 1]]
+            candidates = np.flatnonzero(keys <= kth)
+    else:
+        candidates = np.arange(len(keys))
+    order = candidates[np.lexsort((ids[candidates], keys[candidates]))]
+    if descending:
+        order = order[::-1]
+    return order[:k]
+
+class PartySnapshot:
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._positions: Dict[int, int] = {}
+        self._columns = {name: np.empty(capacity, dtype) for name, dtype in COLUMNS.items()}
+        self._pruned_at = time.monotonic()
+        # Ids written while a load runs, None outside of one
+        self._touched = None
+        self.loaded = False
+
+    def load(self, db: Session) -> int:
+        """Replace the contents with every party that has not ended, returns the row count.
+
+        Requests are served while this runs. Parties the routes write in the
+        meantime are read again, until a pass sees no new writes, and only then
+        do the new arrays replace the old ones.
+        """
+        Party = models.Party
+        statement = select(
+            Party.id, Party.host_id, Party.latitude, Party.longitude, Party.start_time, Party.end_time,
+            Party.created_at, Party.max_attendees, Party.attendee_count
+        ).where(
+            or_(Party.end_time.is_(None), Party.end_time >= _now())
+        )
+        with self._lock:
+            self._touched = set()
+        try:
+            rows = {row.id: _row(row) for row in db.execute(statement)}
+            while True:
+                # End the read transaction, the next pass has to see the writes since
+                db.rollback()
+                with self._lock:
+                    touched, self._touched = self._touched, set()
+                    if not touched:
+                        self._replace(list(rows.values()))
+                        self._touched = None
+                        return len(rows)
+                for party_id in touched:
+                    rows.pop(party_id, None)
+                rows.update((row.id, _row(row)) for row in db.execute(statement.where(Party.id.in_(touched))))
+        except BaseException:
+            with self._lock:
+                self._touched = None
+            raise
+
+    def _replace(self, rows: List[tuple]) -> None:
+        columns = {
+            name: np.array([row[i] for row in rows], dtype) if rows else np.empty(0, dtype)
+            for i, (name, dtype) in enumerate(COLUMNS.items())
+        }
+        self._columns = {name: np.resize(values, max(1024, len(values))) for name, values in columns.items()}
+        self._size = len(rows)
+        self._positions = {int(party_id): i for i, party_id in enumerate(columns["id"])}
+        self._pruned_at = time.monotonic()
+        self.loaded = True
+
+    def _track(self, party_id: int) -> bool:
+        """Record a write for a running load, returns whether the arrays are loaded and take it"""
+        if self._touched is not None:
+            self._touched.add(party_id)
+        return self.loaded
+
+    def upsert(self, party) -> None:
+        """Add or refresh a party, dropping it if it has ended"""
+        if party.end_time is not None and _micros(party.end_time) < _micros(_now()):
+            self.remove(party.id)
+            return
+        row = _row(party)
+        with self._lock:
+            if not self._track(party.id):
+                return
+            position = self._positions.get(party.id)
+            if position is None:
+                position = self._size
+                if position == len(self._columns["id"]):
+                    self._columns = {name: np.resize(values, 2 * len(values)) for name, values in self._columns.items()}
+                self._positions[party.id] = position
+                self._size += 1
+            for name, value in zip(COLUMNS, row):
+                self._columns[name][position] = value
+
+    def remove(self, party_id: int) -> None:
+        with self._lock:
+            if self._track(party_id):
+                self._remove(party_id)
+
+    def _remove(self, party_id: int) -> None:
+        # Swap the last row into the hole so the arrays stay contiguous
+        position = self._positions.pop(party_id, None)
+        if position is None:
+            return
+        last = self._size - 1
+        if position != last:
+            for values in self._columns.values():
+                values[position] = values[last]
+            self._positions[int(self._columns["id"][position])] = position
+        self._size = last
+
+    def add_attendees(self, party_id: int, delta: int) -> None:
+        with self._lock:
+            if not self._track(party_id):
+                return
+            position = self._positions.get(party_id)
+            if position is not None:
+                self._columns["count"][position] += delta
+
+    def _prune(self, now: int) -> None:
+        end = self._columns["end"][:self._size]
+        for party_id in self._columns["id"][:self._size][(end != _LOW) & (end < now)].tolist():
+            self._remove(party_id)
+        self._pruned_at = time.monotonic()
+
+    def query(self, sort: str, limit: int, cursor=None, center=None, start_before: datetime | None = None,
+              end_after: datetime | None = None, host_id: int | None = None,
+              tickets_left: int | None = None) -> Tuple[List[Tuple[int, object]], Dict[int, float]]:
+        """One page of (party id, sort key) pairs (limit + 1 rows) and the distances of those parties.
+
+        Matches the SQL path of POST /parties/filter restricted to parties that
+        have not ended: same filters, same ordering and the same cursor keys.
+        """
+        now = _micros(_now())
+        with self._lock:
+            if time.monotonic() - self._pruned_at > PARTY_SNAPSHOT_PRUNE_INTERVAL:
+                self._prune(now)
+            size = self._size
+            columns = {name: values[:size] for name, values in self._columns.items()}
+
+            end = columns["end"]
+            mask = (end == _LOW) | (end >= now)
+            if start_before is not None:
+                mask &= columns["start"] <= _micros(start_before)
+            if end_after is not None:
+                mask &= end >= _micros(end_after)
+            if host_id:
+                mask &= columns["host_id"] == host_id
+            if tickets_left:
+                capacity = columns["capacity"]
+                mask &= (capacity < 0) | (capacity - columns["count"] >= tickets_left)
+            positions = np.flatnonzero(mask)
+
+            distances = None
+            if center:
+                lat, lng, radius_km = center
+                distances = _haversine(lat, lng, columns["latitude"][positions], columns["longitude"][positions])
+                close = distances <= radius_km
+                positions, distances = positions[close], distances[close]
+
+            ids = columns["id"][positions]
+            if sort == "distance":
+                keys, descending = distances, False
+            else:
+                column, descending = SORT_COLUMNS[sort]
+                keys = columns[column][positions]
+
+        if cursor:
+            key, party_id = cursor
+            if sort in ("created_at", "time"):
+                key = _LOW if key is None else _micros(key)
+            if descending:
+                after = (keys < key) | ((keys == key) & (ids < party_id))
+            else:
+                after = (keys > key) | ((keys == key) & (ids > party_id))
+            ids, keys = ids[after], keys[after]
+            if distances is not None:
+                distances = distances[after]
+
+        top = _top_k(keys, ids, limit + 1, descending)
+        page_ids, page_keys = ids[top].tolist(), keys[top].tolist()
+        if sort in ("created_at", "time"):
+            page_keys = [_datetime(key) for key in page_keys]
+        page_distances = dict(zip(page_ids, distances[top].tolist())) if distances is not None else {}
+        return list(zip(page_ids, page_keys)), page_distances
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self._size, "capacity": len(self._columns["id"]), "loaded": self.loaded}
+
+snapshot = PartySnapshot() if PARTY_SNAPSHOT and np is not None else None
+
+def enabled() -> bool:
+    return snapshot is not None and snapshot.loaded
+
+def upsert(party) -> None:
+    if snapshot is not None:
+        snapshot.upsert(party)
+
+def add_attendees(party_id: int, delta: int) -> None:
+    if snapshot is not None:
+        snapshot.add_attendees(party_id, delta)
+
+def stats() -> dict:
+    return snapshot.stats() if snapshot is not None else {"enabled": False}
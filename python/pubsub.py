@@ -0,0 +1,107 @@
+"""In-process pub/sub for live party updates.
+
+Routes publish small events (attendee count changes, end, cancel) per party
+id and every WebSocket subscriber of that party gets them through its own
+bounded queue. Events are encoded once per publish, not once per subscriber.
+Publishing never blocks: a subscriber whose queue is full is dropped and
+disconnected, and gets a fresh snapshot when it reconnects.
+
+All subscription state lives on the event loop. Sync routes publish from
+worker threads through loop.call_soon_threadsafe.
+"""
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, Set
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "100"))
+# Party ids one connection may watch at once
+MAX_SUBSCRIPTIONS = int(os.getenv("MAX_SUBSCRIPTIONS", "200"))
+# Seconds a new connection has to send its {"token": ...} message
+WS_AUTH_TIMEOUT = float(os.getenv("WS_AUTH_TIMEOUT", "10"))
+
+class Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.party_ids: Set[int] = set()
+        self.closed = False
+
+class Broker:
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._topics: Dict[int, Set[Subscriber]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Attach to the event loop the WebSocket handlers run on"""
+        self._loop = loop
+
+    def connect(self) -> Subscriber:
+        self.connections += 1
+        return Subscriber(self.queue_size)
+
+    def subscribe(self, subscriber: Subscriber, party_ids: Iterable[int]) -> Set[int]:
+        """Add subscriptions up to MAX_SUBSCRIPTIONS, returns the ids actually added"""
+        added = set()
+        for party_id in party_ids:
+            if len(subscriber.party_ids) >= MAX_SUBSCRIPTIONS:
+                break
+            if party_id not in subscriber.party_ids:
+                subscriber.party_ids.add(party_id)
+                self._topics.setdefault(party_id, set()).add(subscriber)
+                added.add(party_id)
+        return added
+
+    def unsubscribe(self, subscriber: Subscriber, party_ids: Iterable[int]) -> None:
+        for party_id in party_ids:
+            subscriber.party_ids.discard(party_id)
+            topic = self._topics.get(party_id)
+            if topic is not None:
+                topic.discard(subscriber)
+                if not topic:
+                    del self._topics[party_id]
+
+    def disconnect(self, subscriber: Subscriber) -> None:
+        if subscriber.closed:
+            return
+        subscriber.closed = True
+        self.connections -= 1
+        self.unsubscribe(subscriber, list(subscriber.party_ids))
+
+    def publish(self, party_id: int, event: dict) -> None:
+        """Queue an event for the subscribers of a party, safe to call from any thread"""
+        # Unlocked read from worker threads, at worst an event races a brand new subscription
+        if self._loop is None or party_id not in self._topics:
+            return
+        self._loop.call_soon_threadsafe(self._deliver, party_id, json.dumps(event))
+
+    def send(self, subscriber: Subscriber, message: str) -> None:
+        """Queue a message for one subscriber, dropping it if it is not keeping up"""
+        if subscriber.closed:
+            return
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.disconnect(subscriber)
+
+    def _deliver(self, party_id: int, message: str) -> None:
+        self.published += 1
+        for subscriber in list(self._topics.get(party_id, ())):
+            self.send(subscriber, message)
+            self.delivered += not subscriber.closed
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "topics": len(self._topics),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+broker = Broker()
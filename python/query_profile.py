@@ -0,0 +1,126 @@
+"""Opt-in statement profiler: slow-query log and a top-N report.
+
+Enabled from database.py with DB_PROFILE=1. Every sampled statement is timed
+and aggregated by its normalized text (literals and IN lists collapsed).
+Statements slower than DB_SLOW_QUERY_MS are logged on the "db.slow" logger
+with their bound parameters, the route that ran them and SQLite's EXPLAIN
+QUERY PLAN. Plans are cached per normalized statement, so a hot slow query
+is explained once per DB_PROFILE_EXPLAIN_INTERVAL seconds, not per call.
+
+Times cover cursor.execute(), where SQLite steps to the first row; rows
+fetched afterwards are not included.
+"""
+import logging
+import random
+import re
+import threading
+import time
+
+from sqlalchemy import event
+
+from metrics import current_route
+
+logger = logging.getLogger("db.slow")
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+# A plain "SCAN party" reads the whole table, ordered index and virtual table scans say more
+_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)\S+$")
+
+def normalize(statement: str) -> str:
+    """Statement text with literals and expanded IN lists replaced by placeholders"""
+    statement = _SPACE.sub(" ", statement).strip()
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    return _IN_LIST.sub("(?, ...)", statement)
+
+class QueryProfile:
+    def __init__(self, slow_ms: float, sample_rate: float, explain_interval: float):
+        self.slow_seconds = slow_ms / 1000
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self._lock = threading.Lock()
+        # normalized statement -> aggregate
+        self._statements = {}
+        # normalized statement -> (explained at, plan lines)
+        self._plans = {}
+
+    def install(self, engine) -> None:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if self.sample_rate >= 1 or random.random() < self.sample_rate:
+                context._profile_started = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_profile_started", None)
+            if started is not None:
+                self.record(cursor, statement, parameters, executemany, time.perf_counter() - started)
+
+    def record(self, cursor, statement: str, parameters, executemany: bool, elapsed: float) -> None:
+        key = normalize(statement)
+        route = current_route()
+        slow = elapsed >= self.slow_seconds
+        plan = self._plan(cursor, key, statement, parameters) if slow and not executemany else None
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                entry = self._statements[key] = {
+                    "statement": key, "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "slow_calls": 0, "routes": set(),
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed * 1000
+            entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+            entry["slow_calls"] += slow
+            if route is not None:
+                entry["routes"].add(route)
+        if slow:
+            logger.warning(
+                "slow query %.1f ms route=%s params=%.500r\n%s\nplan:\n%s",
+                elapsed * 1000, route, parameters, statement, "\n".join(plan or ["(not explained)"]),
+            )
+
+    def _plan(self, cursor, key: str, statement: str, parameters):
+        with self._lock:
+            cached = self._plans.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.explain_interval:
+            return cached[1]
+        if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        explain = cursor.connection.cursor()
+        try:
+            explain.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+            # (id, parent, notused, detail), indent children under their parent
+            depth = {0: -1}
+            plan = []
+            for node, parent, _, detail in explain.fetchall():
+                depth[node] = depth.get(parent, -1) + 1
+                plan.append("  " * depth[node] + detail)
+        except Exception as e:
+            plan = [f"EXPLAIN failed: {e}"]
+        finally:
+            explain.close()
+        with self._lock:
+            self._plans[key] = (time.monotonic(), plan)
+        return plan
+
+    def report(self, top: int = 20, order_by: str = "total_ms") -> list:
+        """The top statements by total_ms, max_ms, avg_ms, calls or slow_calls"""
+        with self._lock:
+            entries = [
+                {**entry, "routes": sorted(entry["routes"]), "plan": self._plans.get(key, (None, None))[1]}
+                for key, entry in self._statements.items()
+            ]
+        for entry in entries:
+            entry["avg_ms"] = entry["total_ms"] / entry["calls"]
+            entry["full_scan"] = any(_FULL_SCAN.match(line.strip()) for line in entry["plan"] or [])
+        entries.sort(key=lambda entry: entry[order_by], reverse=True)
+        return entries[:top]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._plans.clear()
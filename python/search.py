@@ -0,0 +1,65 @@
+import re
+from sqlalchemy import DDL, Column, Integer, MetaData, String, Table, event, func, literal_column
+from models import Party
+
+# bm25 column weights, in party_fts column order: name, description, hashtags
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+HASHTAGS_WEIGHT = 2.0
+
+# External content FTS5 index over party text. Like party_rtree it is kept out
+# of SQLModel.metadata and created by the DDL below.
+party_fts = Table(
+    "party_fts",
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("party_fts", String),  # hidden column used as the MATCH target
+    Column("name", String),
+    Column("description", String),
+    Column("hashtags", String),
+)
+
+FTS_TABLE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS party_fts USING fts5("
+    "name, description, hashtags, content='party', content_rowid='id', prefix='2 3')"
+)
+FTS_TRIGGERS_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS party_fts_ai AFTER INSERT ON party
+    BEGIN
+        INSERT INTO party_fts(rowid, name, description, hashtags)
+        VALUES (new.id, new.name, new.description, new.hashtags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS party_fts_au AFTER UPDATE OF name, description, hashtags ON party
+    BEGIN
+        INSERT INTO party_fts(party_fts, rowid, name, description, hashtags)
+        VALUES ('delete', old.id, old.name, old.description, old.hashtags);
+        INSERT INTO party_fts(rowid, name, description, hashtags)
+        VALUES (new.id, new.name, new.description, new.hashtags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS party_fts_ad AFTER DELETE ON party
+    BEGIN
+        INSERT INTO party_fts(party_fts, rowid, name, description, hashtags)
+        VALUES ('delete', old.id, old.name, old.description, old.hashtags);
+    END""",
+]
+FTS_TRIGGER_NAMES = ["party_fts_ai", "party_fts_au", "party_fts_ad"]
+# Rebuilds the whole index from the party table in one pass
+FTS_REBUILD_SQL = "INSERT INTO party_fts(party_fts) VALUES ('rebuild')"
+
+for statement in [FTS_TABLE_DDL, *FTS_TRIGGERS_DDL]:
+    event.listen(Party.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+def match_expression(text: str) -> str | None:
+    """Turn free text into an FTS5 query that matches any word as a prefix"""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    return " OR ".join(f'"{word}"*' for word in dict.fromkeys(words))
+
+def matches(expression: str):
+    """WHERE clause restricting party_fts to rows matching an FTS5 query"""
+    return party_fts.c.party_fts.match(expression)
+
+def rank():
+    """Weighted BM25 relevance, higher is better (bm25() itself is lower-is-better)"""
+    return -func.bm25(literal_column("party_fts"), NAME_WEIGHT, DESCRIPTION_WEIGHT, HASHTAGS_WEIGHT)
@@ -0,0 +1,108 @@
+from fastapi import HTTPException
+from typing import Dict, List
+import models
+
+# Plain party columns a client may ask for with fields=
+PARTY_COLUMNS = {
+    "id": models.Party.id,
+    "name": models.Party.name,
+    "description": models.Party.description,
+    "hashtags": models.Party.hashtags,
+    "host_id": models.Party.host_id,
+    "latitude": models.Party.latitude,
+    "longitude": models.Party.longitude,
+    "address": models.Party.address,
+    "start_time": models.Party.start_time,
+    "end_time": models.Party.end_time,
+    "max_attendees": models.Party.max_attendees,
+    "attendee_count": models.Party.attendee_count,
+    "media_url": models.Party.media_url,
+    "created_at": models.Party.created_at,
+    "updated_at": models.Party.updated_at,
+}
+
+# Composite fields and the columns they are built from
+COMPUTED_FIELDS = {
+    "host": ["host_id"],
+    "location": ["latitude", "longitude", "address"],
+    "distance": [],
+    "attendees": [],
+}
+
+# Default response shapes of the listing endpoints
+LIST_FIELDS = ["id", "name", "description", "host", "attendee_count", "location",
+               "start_time", "end_time", "max_attendees", "created_at"]
+FILTER_FIELDS = ["id", "name", "description", "hashtags", "distance", "attendee_count",
+                 "start_time", "end_time", "max_attendees"]
+DETAIL_FIELDS = ["id", "name", "description", "host", "attendees", "location",
+                 "start_time", "end_time", "max_attendees", "created_at"]
+
+# Fields an endpoint can fill, the listings do not load attendee lists
+DETAIL_SUPPORTED = frozenset([*PARTY_COLUMNS, *COMPUTED_FIELDS])
+LIST_SUPPORTED = DETAIL_SUPPORTED - {"attendees"}
+
+def parse_fields(fields: str | None, default: List[str], supported: frozenset = DETAIL_SUPPORTED) -> List[str]:
+    """Parse a comma separated fields= projection, id is always included"""
+    if not fields:
+        return list(default)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PARTY_COLUMNS and field not in COMPUTED_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    unsupported = [field for field in requested if field not in supported]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Fields not available on this endpoint: {', '.join(unsupported)}")
+    if "id" not in requested:
+        requested.insert(0, "id")
+    return list(dict.fromkeys(requested))
+
+def party_columns(fields: List[str], *extra: str) -> list:
+    """Columns to SELECT for a projection, plus any extra columns the query needs"""
+    names = ["id"]
+    for field in [*fields, *extra]:
+        names.extend(COMPUTED_FIELDS.get(field, [field]))
+    return [PARTY_COLUMNS[name] for name in dict.fromkeys(names)]
+
+def archive_columns(fields: List[str], *extra: str) -> list:
+    """party_columns read from party_archive, which has the same column names"""
+    return [getattr(models.ArchivedParty, column.key) for column in party_columns(fields, *extra)]
+
+def _timestamp(value, utc_suffix: bool):
+    if value is None or not utc_suffix:
+        return value
+    return value.isoformat() + "Z"
+
+def serialize_party(party, fields: List[str], hosts: Dict[int, models.User] | None = None,
+                    distances: Dict[int, float] | None = None, utc_suffix: bool = False,
+                    attendees: Dict[int, List[models.User]] | None = None) -> dict:
+    """Build the response dict for a party row or a projected column row"""
+    data = {}
+    for field in fields:
+        if field == "host":
+            host = (hosts or {}).get(party.host_id)
+            data["host"] = {
+                "id": host.id,
+                "username": host.username
+            } if host else None
+        elif field == "location":
+            data["location"] = {
+                "latitude": party.latitude,
+                "longitude": party.longitude,
+                "address": party.address
+            }
+        elif field == "distance":
+            data["distance"] = (distances or {}).get(party.id, 0)
+        elif field == "attendees":
+            data["attendees"] = [
+                {
+                    "id": user.id,
+                    "username": user.username,
+                    "pfpURL": user.pfpURL
+                }
+                for user in (attendees or {}).get(party.id, [])
+            ]
+        elif field in ("start_time", "end_time"):
+            data[field] = _timestamp(getattr(party, field), utc_suffix)
+        else:
+            data[field] = getattr(party, field)
+    return data
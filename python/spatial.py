@@ -0,0 +1,90 @@
+import math
+from sqlalchemy import DDL, Column, Float, Integer, MetaData, Table, event
+from sqlmodel import select, or_, and_
+from models import Party
+
+EARTH_RADIUS_KM = 6371
+
+# SQLite R*Tree over party coordinates. It lives in its own MetaData so
+# create_all does not try to create it as a regular table; the DDL below does.
+party_rtree = Table(
+    "party_rtree",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("min_lat", Float),
+    Column("max_lat", Float),
+    Column("min_lng", Float),
+    Column("max_lng", Float),
+)
+
+# The triggers keep party_rtree in sync with every writer, ORM or raw sqlite3
+RTREE_TABLE_DDL = "CREATE VIRTUAL TABLE IF NOT EXISTS party_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)"
+RTREE_TRIGGERS_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS party_rtree_ai AFTER INSERT ON party
+    WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+    BEGIN
+        INSERT INTO party_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS party_rtree_au AFTER UPDATE OF latitude, longitude ON party
+    BEGIN
+        DELETE FROM party_rtree WHERE id = old.id;
+        INSERT INTO party_rtree SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS party_rtree_ad AFTER DELETE ON party
+    BEGIN
+        DELETE FROM party_rtree WHERE id = old.id;
+    END""",
+]
+RTREE_TRIGGER_NAMES = ["party_rtree_ai", "party_rtree_au", "party_rtree_ad"]
+# Bulk (re)population for rows written while the triggers were off
+RTREE_REBUILD_SQL = (
+    "INSERT OR REPLACE INTO party_rtree "
+    "SELECT id, latitude, latitude, longitude, longitude FROM party "
+    "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+)
+
+for statement in [RTREE_TABLE_DDL, *RTREE_TRIGGERS_DDL]:
+    event.listen(Party.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+def calculate_distance(lat1, lng1, lat2, lng2):
+    """Calculate distance between two points in km"""
+    lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+    return EARTH_RADIUS_KM * c
+
+def bounding_boxes(lat: float, lng: float, radius_km: float):
+    """Lat/lng boxes that contain every point within radius_km of (lat, lng).
+
+    Returns one box normally, two when the circle crosses the antimeridian and
+    a full-longitude band when it reaches a pole.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angular)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        return [(max(min_lat, -90), min(max_lat, 90), -180, 180)]
+
+    dlng = math.degrees(math.asin(min(1, math.sin(angular) / math.cos(math.radians(lat)))))
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180:
+        return [(min_lat, max_lat, min_lng + 360, 180), (min_lat, max_lat, -180, max_lng)]
+    if max_lng > 180:
+        return [(min_lat, max_lat, min_lng, 180), (min_lat, max_lat, -180, max_lng - 360)]
+    return [(min_lat, max_lat, min_lng, max_lng)]
+
+def parties_near(lat: float, lng: float, radius_km: float):
+    """Subquery of party ids whose coordinates fall in the radius bounding boxes"""
+    boxes = [
+        and_(
+            party_rtree.c.min_lat <= max_lat,
+            party_rtree.c.max_lat >= min_lat,
+            party_rtree.c.min_lng <= max_lng,
+            party_rtree.c.max_lng >= min_lng,
+        )
+        for min_lat, max_lat, min_lng, max_lng in bounding_boxes(lat, lng, radius_km)
+    ]
+    return select(party_rtree.c.id).where(or_(*boxes))
@@ -0,0 +1,87 @@
+"""Startup timing and readiness.
+
+main.py records how long its own import took and the lifespan handler times
+every startup phase here. Serving starts as soon as the tables exist; the
+party snapshot load and the optional warmup (pooled connections, hot
+statements, the default feed, token signing keys) run in the background and
+GET /ready answers 503 until they are done.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from database import DB_POOL_SIZE
+
+logger = logging.getLogger("startup")
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1").lower() in ("1", "true", "yes")
+# Pooled connections opened and run through the hot statements before ready
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(DB_POOL_SIZE)))
+# Readiness does not wait longer than this on Google's signing certificates
+WARMUP_KEY_TIMEOUT = float(os.getenv("WARMUP_KEY_TIMEOUT", "10"))
+
+class StartupState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.import_seconds: float | None = None
+        self.phases = {}  # phase -> seconds, in the order they ran
+        self.errors = {}  # phase -> error of an optional phase that failed
+        self.started: float | None = None
+        self.startup_seconds: float | None = None
+        self.ready = False
+
+    def imported(self, seconds: float) -> None:
+        self.import_seconds = seconds
+
+    def begin(self) -> None:
+        self.started = time.perf_counter()
+        self.ready = False
+
+    @contextmanager
+    def phase(self, name: str, optional: bool = False):
+        """Time one startup step, an optional step that fails is logged and skipped"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if not optional:
+                raise
+            logger.warning("startup phase %s failed", name, exc_info=True)
+            with self._lock:
+                self.errors[name] = str(e) or type(e).__name__
+        finally:
+            with self._lock:
+                self.phases[name] = time.perf_counter() - started
+
+    def mark_ready(self) -> None:
+        self.startup_seconds = time.perf_counter() - self.started
+        self.ready = True
+        logger.info(
+            "ready in %.3fs (import %.3fs) %s",
+            self.startup_seconds, self.import_seconds or 0,
+            " ".join(f"{name}={seconds:.3f}s" for name, seconds in self.phases.items()),
+        )
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "import_seconds": self.import_seconds,
+                "startup_seconds": self.startup_seconds,
+                "phases": dict(self.phases),
+                "errors": dict(self.errors),
+            }
+
+    def samples(self):
+        """(labels, seconds) pairs for the startup_seconds gauge"""
+        report = self.report()
+        samples = [({"phase": name}, seconds) for name, seconds in report["phases"].items()]
+        if report["import_seconds"] is not None:
+            samples.append(({"phase": "import"}, report["import_seconds"]))
+        if report["startup_seconds"] is not None:
+            samples.append(({"phase": "ready"}, report["startup_seconds"]))
+        return samples
+
+state = StartupState()
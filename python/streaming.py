@@ -0,0 +1,69 @@
+"""Chunked NDJSON / JSON array responses for large party result sets.
+
+Rows come off a server-side cursor STREAM_BATCH_SIZE at a time (yield_per)
+and are serialized as they arrive, so an export of the whole table runs in
+constant memory and the first bytes go out before the query has finished.
+"""
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from database import engine
+from models import get_users_by_ids
+from serializers import serialize_party
+from spatial import calculate_distance
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _batches(query, fields, center, utc_suffix):
+    """Serialized parties, one list per yield_per batch"""
+    # The request's session is closed before the body is sent, so the
+    # stream holds its own for as long as the cursor is open
+    with Session(engine) as sesh:
+        result = sesh.exec(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        for rows in result.partitions():
+            distances = {}
+            if center:
+                lat, lng, radius_km = center
+                for row in rows:
+                    distances[row.id] = calculate_distance(lat, lng, row.latitude, row.longitude)
+                rows = [row for row in rows if distances[row.id] <= radius_km]
+            hosts = get_users_by_ids(sesh, [row.host_id for row in rows]) if "host" in fields else {}
+            yield [json.dumps(serialize_party(row, fields, hosts, distances, utc_suffix), default=_default) for row in rows]
+
+# One chunk per batch, StreamingResponse pays a threadpool hop per chunk
+def _ndjson(batches):
+    for batch in batches:
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+def _json_array(batches):
+    # Same document shape as the paged endpoints, without next_cursor
+    yield '{"parties": ['
+    separator = ""
+    for batch in batches:
+        if batch:
+            yield separator + ",".join(batch)
+            separator = ","
+    yield "]}"
+
+def stream_parties(query, fields, fmt: str, center=None, utc_suffix: bool = False) -> StreamingResponse:
+    """Stream every row of an ordered party query as NDJSON or a JSON array.
+
+    With a center, rows outside the exact radius are dropped as they stream.
+    """
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"stream must be one of: {', '.join(MEDIA_TYPES)}")
+    batches = _batches(query, fields, center, utc_suffix)
+    body = _ndjson(batches) if fmt == "ndjson" else _json_array(batches)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt])
@@ -0,0 +1,30 @@
+"""Settings for the test run, applied before any app module reads its environment."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A throwaway database, and no background sweep or warmup touching it mid-test
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="partyytimee-"), "test.db")
+os.environ["PARTY_SWEEP_INTERVAL"] = "0"
+os.environ["STARTUP_WARMUP"] = "0"
+
+import pytest
+from fastapi import Header
+from fastapi.testclient import TestClient
+
+def _verified(x_test_user: str = Header(...)):
+    return {"user_id": x_test_user}
+
+@pytest.fixture(scope="session")
+def client():
+    """App client authenticated as the firebase uid in the X-Test-User header"""
+    import database
+    import IDVerification
+    import main
+    database.init_db()
+    main.app.dependency_overrides[IDVerification.verify_firebase_token] = _verified
+    # No lifespan, nothing but the request under test runs statements
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
@@ -0,0 +1,82 @@
+"""fields= projections on the party endpoints."""
+from datetime import datetime, timedelta
+import datetime as dt
+
+import pytest
+from sqlmodel import Session
+
+import database
+import models
+
+USER = "projections"
+
+@pytest.fixture(scope="module")
+def party_ids(client):
+    """A live party with one attendee and an archived one with one attendee"""
+    now = datetime.now(dt.UTC).replace(tzinfo=None)
+    with Session(database.engine) as sesh:
+        host = models.User(username="projection host", email=None, pfpURL=None, firebase_uid=USER, isHost=True)
+        guest = models.User(username="projection guest", email=None, pfpURL=None)
+        sesh.add_all([host, guest])
+        sesh.flush()
+        sesh.add(models.Host(id=host.id, user_id=host.id))
+        party = models.Party(
+            name="live", host_id=host.id, start_time=now, end_time=now + timedelta(hours=4), attendee_count=1
+        )
+        sesh.add(party)
+        sesh.flush()
+        sesh.add(models.Attendance(party_id=party.id, user_id=guest.id))
+        archived_id = party.id + 1000
+        sesh.add(models.ArchivedParty(
+            id=archived_id, name="over", host_id=host.id, start_time=now - timedelta(days=3),
+            end_time=now - timedelta(days=2), attendee_count=1, archived_at=now,
+        ))
+        sesh.add(models.ArchivedAttendance(party_id=archived_id, user_id=guest.id))
+        sesh.commit()
+        return party.id, archived_id, guest.id
+
+def get(client, url):
+    return client.get(url, headers={"X-Test-User": USER})
+
+@pytest.mark.parametrize("fields", ["id", "distance"])
+def test_party_detail_with_only_id_column(client, party_ids, fields):
+    party_id, _, _ = party_ids
+    response = get(client, f"/parties/{party_id}?fields={fields}")
+    assert response.status_code == 200, response.text
+    assert response.json()["id"] == party_id
+
+@pytest.mark.parametrize("fields", ["id", "id,attendees"])
+def test_batch_with_only_id_column(client, party_ids, fields):
+    party_id, _, guest_id = party_ids
+    response = client.post("/parties/batch", json={"ids": [party_id], "fields": fields}, headers={"X-Test-User": USER})
+    assert response.status_code == 200, response.text
+    party = response.json()["results"][0]["party"]
+    assert party["id"] == party_id
+    if "attendees" in fields:
+        assert [attendee["id"] for attendee in party["attendees"]] == [guest_id]
+
+@pytest.mark.parametrize("fields", ["id", "id,attendees"])
+def test_archived_party_with_only_id_column(client, party_ids, fields):
+    _, archived_id, guest_id = party_ids
+    response = get(client, f"/parties/history/{archived_id}?fields={fields}")
+    assert response.status_code == 200, response.text
+    party = response.json()
+    assert party["id"] == archived_id
+    if "attendees" in fields:
+        assert [attendee["id"] for attendee in party["attendees"]] == [guest_id]
+
+def test_filter_loads_hosts(client, party_ids):
+    party_id, _, _ = party_ids
+    response = client.post("/parties/filter", json={"fields": "id,host", "limit": 200}, headers={"X-Test-User": USER})
+    assert response.status_code == 200, response.text
+    party = next(party for party in response.json()["parties"] if party["id"] == party_id)
+    assert party["host"]["username"] == "projection host"
+
+@pytest.mark.parametrize("method,url,body", [
+    ("GET", "/parties?fields=id,attendees", None),
+    ("POST", "/parties/filter", {"fields": "host,attendees"}),
+])
+def test_listings_reject_attendees(client, party_ids, method, url, body):
+    response = client.request(method, url, json=body, headers={"X-Test-User": USER})
+    assert response.status_code == 400
+    assert "attendees" in response.json()["detail"]
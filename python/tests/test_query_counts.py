@@ -0,0 +1,87 @@
+"""Statements per request stay the same however many parties, attendees and saved parties there are."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import datetime as dt
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+import database
+import filter_cache
+import IDVerification
+import models
+
+VIEWER = "viewer"
+
+@pytest.fixture(scope="module", autouse=True)
+def viewer(client):
+    with Session(database.engine) as sesh:
+        sesh.add(models.User(username=VIEWER, email=None, pfpURL=None, firebase_uid=VIEWER))
+        sesh.commit()
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+
+def grow(parties: int, attendees: int) -> int:
+    """Add a host with `parties` parties of `attendees` attendees each, saved by the viewer, returns the last party id"""
+    now = datetime.now(dt.UTC).replace(tzinfo=None)
+    with Session(database.engine) as sesh:
+        host = models.User(username="host", email=None, pfpURL=None, isHost=True)
+        sesh.add(host)
+        sesh.flush()
+        # Parties point at Host.id, keep it equal to the user id like the app's data does
+        sesh.add(models.Host(id=host.id, user_id=host.id))
+        party_ids = []
+        for i in range(parties):
+            party = models.Party(
+                name=f"party {i}", host_id=host.id, latitude=40.7, longitude=-74.0,
+                start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=5), attendee_count=attendees,
+            )
+            sesh.add(party)
+            sesh.flush()
+            party_ids.append(party.id)
+            for j in range(attendees):
+                guest = models.User(username=f"guest {j}", email=None, pfpURL=None)
+                sesh.add(guest)
+                sesh.flush()
+                sesh.add(models.Attendance(party_id=party.id, user_id=guest.id))
+        viewer = sesh.exec(models.select(models.User).where(models.User.firebase_uid == VIEWER)).one()
+        models.set_saved_party_ids(viewer, models.get_saved_party_ids(viewer) + party_ids)
+        sesh.add(models.User(username="joiner", email=None, pfpURL=None, firebase_uid=f"joiner-{party_ids[-1]}"))
+        sesh.commit()
+    return party_ids[-1]
+
+def statements_per_request(client, party_id: int) -> dict:
+    requests = {
+        "GET /parties": ("GET", "/parties?limit=100", VIEWER, None),
+        "POST /parties/filter": ("POST", "/parties/filter", VIEWER, {"limit": 100}),
+        "GET /parties/{id}": ("GET", f"/parties/{party_id}", VIEWER, None),
+        "GET /users/saved-parties": ("GET", "/users/saved-parties", VIEWER, None),
+        "POST /parties/{id}/join": ("POST", f"/parties/{party_id}/join", f"joiner-{party_id}", None),
+    }
+    counts = {}
+    for name, (method, url, user, body) in requests.items():
+        # Count what a cold request runs, not what happens to be cached
+        IDVerification.user_cache.clear()
+        filter_cache.filter_cache.clear()
+        with count_statements() as statements:
+            response = client.request(method, url, json=body, headers={"X-Test-User": user})
+        assert response.status_code == 200, (name, response.text)
+        counts[name] = len(statements)
+    return counts
+
+def test_statement_counts_do_not_grow_with_data(client):
+    small = statements_per_request(client, grow(parties=2, attendees=2))
+    large = statements_per_request(client, grow(parties=40, attendees=25))
+    assert large == small
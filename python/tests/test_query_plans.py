@@ -0,0 +1,83 @@
+"""The key queries use the indexes of the index_party_access_paths migration (d5a8e3c71f42)."""
+import os
+from datetime import datetime, timedelta
+import datetime as dt
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlmodel import Session, SQLModel, create_engine, select
+
+import filter_cache
+import IDVerification
+import main
+import models
+from query_profile import QueryProfile
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic")
+# The revision before the index pack
+BEFORE_INDEXES = "b7d41f2e9a60"
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    url = "sqlite:///" + str(tmp_path_factory.mktemp("plans") / "migrated.db")
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    config.set_main_option("sqlalchemy.url", url)
+    # The oldest revisions cannot build an empty database, so start from the
+    # current schema, step back below the index pack and migrate through it
+    SQLModel.metadata.create_all(engine)
+    command.stamp(config, "head")
+    command.downgrade(config, BEFORE_INDEXES)
+    assert "ix_party_host_id_created_at" not in {index["name"] for index in inspect(engine).get_indexes("party")}
+    command.upgrade(config, "head")
+
+    now = datetime.now(dt.UTC).replace(tzinfo=None)
+    with Session(engine) as sesh:
+        user = models.User(username="host", email=None, pfpURL=None, firebase_uid="plan-host", isHost=True)
+        sesh.add(user)
+        sesh.flush()
+        sesh.add(models.Host(id=user.id, user_id=user.id))
+        for i in range(20):
+            sesh.add(models.Party(
+                name=f"party {i}", host_id=user.id,
+                start_time=now + timedelta(hours=i - 10), end_time=now + timedelta(hours=i - 5),
+            ))
+        sesh.commit()
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(scope="module")
+def profile(engine):
+    # Every statement counts as slow, so every one gets explained
+    profile = QueryProfile(slow_ms=0, sample_rate=1.0, explain_interval=3600)
+    profile.install(engine)
+    return profile
+
+def query_plans(profile, engine, route, *args, **kwargs) -> str:
+    """Run a route on the migrated database, returns the query plans of every statement it issued"""
+    profile.reset()
+    IDVerification.user_cache.clear()
+    filter_cache.filter_cache.clear()
+    with Session(engine) as sesh:
+        route(*args, sesh=sesh, **kwargs)
+    return "\n".join(line for entry in profile.report(top=1000) for line in entry["plan"] or [])
+
+def test_create_party_finds_the_host_by_user_id(profile, engine):
+    request = main.CreatePartyRequest(name="new party")
+    plans = query_plans(profile, engine, main.create_party, request, token_data={"user_id": "plan-host"})
+    assert "USING INDEX sqlite_autoindex_host_1 (user_id=?)" in plans
+
+def test_host_filter_uses_host_created_at_index(profile, engine):
+    with Session(engine) as sesh:
+        host_id = sesh.exec(select(models.Host.id)).first()
+    plans = query_plans(profile, engine, main.filter_parties, main.PartyFilters(host_id=host_id), token_data={})
+    assert "USING INDEX ix_party_host_id_created_at (host_id=?)" in plans
+
+def test_live_now_filter_uses_end_start_index(profile, engine):
+    now = datetime.now(dt.UTC).replace(tzinfo=None).isoformat()
+    filters = main.PartyFilters(date_range={"start": now, "end": now}, sort_by="time")
+    plans = query_plans(profile, engine, main.filter_parties, filters, token_data={})
+    assert "USING INDEX ix_party_end_time_start_time" in plans